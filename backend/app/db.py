@@ -1,10 +1,58 @@
-from pymongo import MongoClient
+from typing import Optional
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
 from app.settings import settings
+from app.services.db.indexes import ensure_indexes
+from app.services.db.monitoring import get_listeners
 
-client = MongoClient(
-    settings.MONGO_URI,
-    serverSelectionTimeoutMS=2000,
-    connectTimeoutMS=2000,
-    socketTimeoutMS=2000,
-)
-db = client[settings.MONGO_DB]
+# Un único cliente async con pool, creado y cerrado en el lifespan de la app
+_client: Optional[AsyncMongoClient] = None
+
+
+def create_client() -> AsyncMongoClient:
+    return AsyncMongoClient(
+        settings.MONGO_URI,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        event_listeners=get_listeners(),
+    )
+
+
+async def connect() -> AsyncMongoClient:
+    global _client
+    if _client is None:
+        _client = create_client()
+    if settings.MONGO_ENSURE_INDEXES:
+        await ensure_indexes(_client[settings.MONGO_DB])
+    return _client
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_db() -> AsyncDatabase:
+    global _client
+    # Fuera del lifespan (scripts, consola) se crea el cliente bajo demanda
+    if _client is None:
+        _client = create_client()
+    return _client[settings.MONGO_DB]
+
+
+class _DatabaseProxy:
+    """Resuelve ``db.<colección>`` contra el cliente vigente en cada acceso."""
+
+    def __getattr__(self, name: str):
+        return get_db()[name]
+
+    def __getitem__(self, name: str):
+        return get_db()[name]
+
+
+db = _DatabaseProxy()
@@ -1,8 +1,20 @@
-from typing import Annotated
-from fastapi import Query
+from typing import Annotated, Literal, Optional
+from fastapi import HTTPException, Query
+
+from app.services.db.pagination import decode_cursor
 
 def pagination_params(
     skip: Annotated[int, Query(ge=0)] = 0,
     limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: Annotated[Optional[str], Query(description="Cursor opaco devuelto en X-Next-Cursor")] = None,
+    order: Annotated[Literal["id", "recent"], Query()] = "id",
 ):
-    return {"skip": skip, "limit": limit}
+    decoded = None
+    if cursor:
+        try:
+            decoded = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if decoded["order"] != order:
+            raise HTTPException(status_code=400, detail="El cursor corresponde a otro orden")
+    return {"skip": skip, "limit": limit, "cursor": decoded, "order": order}
@@ -1,18 +1,42 @@
 # app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
-from app.routers import simulation, export as export_router
+from app.routers import simulation, export as export_router, export_jobs as export_jobs_router
+from app.services import auth_cache, compression, export_jobs, flow_events, invalidation, project_export, simulate
+from anyio import to_thread
+from app.middleware import CompressionMiddleware, MetricsMiddleware, ProfilingMiddleware
+from app.services import metrics
+from app.services.db.monitoring import slow_command_stats
+from app.services.flow_graph import compiled_cache_stats
+from app.services.security import hashing_load
+from app.settings import settings
+from app import db as mongo
 
 
 # Routers
 from app.routers import projects, flows, auth
 
+# 0) Ciclo de vida: un único cliente Mongo (async, con pool) por proceso
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await mongo.connect()
+    # Caches en memoria al día con lo que escriben los demás workers
+    invalidation.start(mongo.get_db())
+    yield
+    await invalidation.stop()
+    export_jobs.shutdown()
+    project_export.shutdown()
+    simulate.shutdown()
+    await mongo.close()
+
 # 1) Instancia de la app
-app = FastAPI(title="BotVerse API")
+app = FastAPI(title="BotVerse API", lifespan=lifespan)
 app.include_router(export_router.router)  
+app.include_router(export_jobs_router.router)
 app.include_router(simulation.router)  
 
 # 2) (Opcional) CORS para el frontend local
@@ -22,8 +46,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paginación por cursor y caché de exports
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# Flujos y exports: JSON muy repetitivo (posiciones, acciones, handles)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    paths=("/flows", "/bots", "/projects"),
 )
 
+# Perfilado opt-in: deshabilitado no agrega ningún middleware
+if settings.PROFILING_ENABLED:
+    from app.routers import profiles
+    app.include_router(profiles.router)
+    app.add_middleware(
+        ProfilingMiddleware,
+        header=settings.PROFILING_HEADER,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+    )
+
+# Más externo que la compresión: la latencia incluye todo el trabajo del request
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # 3) Handlers de errores uniformes (Sprint 1)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -43,6 +90,46 @@ app.include_router(flows.router)
 def health():
     return {"ok": True}
 
+# Aciertos / fallos de los caches de autenticación (para dimensionarlos)
+@app.get("/health/caches")
+def health_caches():
+    return {
+        "auth": auth_cache.stats(),
+        "compression": compression.stats(),
+        "invalidation": invalidation.stats(),
+        "flow_events": flow_events.stats(),
+    }
+
+@metrics.collector
+def _collect_pools():
+    limiter = to_thread.current_default_thread_limiter()
+    metrics.threadpool_busy.set("default", value=limiter.borrowed_tokens)
+    metrics.threadpool_capacity.set("default", value=limiter.total_tokens)
+    busy, capacity = hashing_load()
+    metrics.threadpool_busy.set("bcrypt", value=busy)
+    metrics.threadpool_capacity.set("bcrypt", value=capacity)
+
+@metrics.collector
+def _collect_caches():
+    metrics.observe_caches({
+        "auth_tokens": auth_cache.stats()["tokens"],
+        "auth_users": auth_cache.stats()["users"],
+        "compression": compression.stats(),
+        "compiled_flows": compiled_cache_stats(),
+    })
+
+@metrics.collector
+def _collect_slow_commands():
+    for (collection, command), count in slow_command_stats().items():
+        metrics.mongo_slow.set(collection, command, value=count)
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    # async: los collectors leen el limitador de anyio desde el event loop
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "BOTVERSE API running "}
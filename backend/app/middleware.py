@@ -0,0 +1,138 @@
+import random
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import metrics, profiling
+from app.services.compression import compress, compressible, negotiate
+
+
+class MetricsMiddleware:
+    """Cuenta requests por ruta (plantilla, no path real), estado y latencia; y los que están en curso."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_in_flight.dec()
+            # FastAPI deja la ruta resuelta en el scope; sin ruta no se usa el path (cardinalidad)
+            route = scope.get("route")
+            path = getattr(route, "path", "<sin ruta>")
+            method = scope["method"]
+            metrics.http_latency.observe(method, path, value=time.perf_counter() - start)
+            metrics.http_requests.inc(method, path, str(status))
+
+
+class CompressionMiddleware:
+    """gzip/brotli negociado para las rutas indicadas.
+
+    Respuestas que ya traen Content-Encoding (p. ej. el cache de flujos) o que no son
+    comprimibles (zip) pasan sin tocarse; el resto se junta y se comprime una vez.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, paths: tuple = ("/",)):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        parts = []
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or not compressible(headers.get("content-type", "")):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(parts)
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) >= self.minimum_size:
+                body = await run_in_threadpool(compress, body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class ProfilingMiddleware:
+    """Perfila las requests que lo piden por header o que salen sorteadas por ``sample_rate``.
+
+    Agrega Server-Timing (reloj, CPU, Mongo), las funciones más costosas y el id del perfil
+    completo. En respuestas por streaming los headers cubren hasta el primer byte; el
+    perfil guardado cubre la request entera.
+    """
+
+    def __init__(self, app: ASGIApp, header: str, sample_rate: float = 0.0):
+        self.app = app
+        self.header = header.lower()
+        self.sample_rate = sample_rate
+
+    def _wanted(self, scope: Scope) -> bool:
+        value = Headers(scope=scope).get(self.header)
+        if value is not None:
+            return value.lower() not in ("", "0", "false", "no")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiling.Profile(scope["method"], scope["path"])
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.snapshot()
+                headers = MutableHeaders(raw=message["headers"])
+                headers["X-Profile-Id"] = profile.id
+                headers.append("Server-Timing", profile.server_timing())
+                headers["X-Profile-Top"] = profile.top_header().encode("ascii", "replace").decode()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profile.finish()
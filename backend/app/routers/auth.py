@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Cookie, Response
 from pydantic import BaseModel, EmailStr
-from bson import ObjectId
-from app.config import db
+from pymongo.errors import DuplicateKeyError
+from app.db import db
 from typing import Optional
-from app.services.security import hash_password, verify_password, create_access_token, decode_token
+from app.services.security import HashingBusy, create_access_token, hash_password, run_hashing, verify_and_update
+from app.services import auth_cache
 from app.utils import format_mongo_document
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -17,21 +18,39 @@ class Login(BaseModel):
     email: EmailStr
     password: str
 
+async def _hashing(fn, *args):
+    try:
+        return await run_hashing(fn, *args)
+    except HashingBusy:
+        # Mejor rechazar rápido que encolar sin límite detrás de bcrypt
+        raise HTTPException(429, "Demasiadas solicitudes de autenticación, reintente", headers={"Retry-After": "1"})
+
 @router.post("/register")
-def register(body: Register):
-    exists = db.users.find_one({"email": body.email})
+async def register(body: Register):
+    exists = await db.users.find_one({"email": body.email})
     if exists:
         raise HTTPException(409, "Email ya registrado")
-    doc = {"fullName": body.fullName, "email": body.email, "password": hash_password(body.password)}
-    res = db.users.insert_one(doc)
+    doc = {"fullName": body.fullName, "email": body.email, "password": await _hashing(hash_password, body.password)}
+    try:
+        res = await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        # Dos registros simultáneos: el índice único sobre email decide
+        raise HTTPException(409, "Email ya registrado")
     return {"id": str(res.inserted_id), "email": body.email}
 
 @router.post("/login")
-def login(response: Response, body: Login):
-    user = db.users.find_one({"email": body.email})
-    if not user or not verify_password(body.password, user["password"]):
+async def login(response: Response, body: Login):
+    user = await db.users.find_one({"email": body.email})
+    if not user:
         raise HTTPException(401, "Credenciales inválidas")
-    
+    valid, new_hash = await _hashing(verify_and_update, body.password, user["password"])
+    if not valid:
+        raise HTTPException(401, "Credenciales inválidas")
+    if new_hash:
+        # Cambió AUTH_BCRYPT_ROUNDS: se aprovecha la contraseña en claro para rehashear
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+        auth_cache.invalidate_user(str(user["_id"]))
+
     userFormatted = { "user": format_mongo_document(user) }
     expirationTimeSeconds = 60
     token = create_access_token(str(user["_id"]), userFormatted, expirationTimeSeconds)
@@ -44,16 +63,15 @@ def login(response: Response, body: Login):
     return userFormatted
 
 # dependencia para extraer usuario desde el token
-def get_current_user(access_token: Optional[str] = Cookie(default=None)):
+async def get_current_user(access_token: Optional[str] = Cookie(default=None)):
     if not access_token:
         raise HTTPException(401, "Token requerido")
 
-    data = decode_token(access_token)
+    # En régimen estable no hay decode ni consulta a Mongo: ambos salen de cache
+    data = auth_cache.get_claims(access_token)
     if not data:
         raise HTTPException(401, "Token inválido")
-    uid = data.get("sub")
-    user = db.users.find_one({"_id": ObjectId(uid)})
+    user = await auth_cache.get_user(str(data.get("sub")))
     if not user:
         raise HTTPException(401, "Usuario no encontrado")
-    user["_id"] = str(user["_id"])
-    return format_mongo_document(user)
+    return user
@@ -1,28 +1,37 @@
-from fastapi import APIRouter, HTTPException
-from app.config import db
+from fastapi import APIRouter, HTTPException, Request, Response
 from bson import ObjectId
-from app.utils import format_mongo_document
-from app.services.rasa import generate_rasa_project
+from app.services import flow_compile
+from app.services.export_cache import content_hash, etag_matches, stream_export
 from fastapi.responses import StreamingResponse
-from io import BytesIO
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter(prefix="/bots", tags=["export"])
 
 @router.get("/flows/{flow_id}/export", response_class=StreamingResponse)
-def export_rasa(flow_id: str):
+async def export_rasa(flow_id: str, request: Request):
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    doc = db.flows.find_one({"_id": ObjectId(flow_id)})
+    # Se exporta la forma compilada al guardar: el diagrama no se trae
+    doc = await flow_compile.load(ObjectId(flow_id))
     if not doc:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    try:
+        graph = flow_compile.graph_of(doc)
+    except flow_compile.FlowInvalid as exc:
+        # Antes de empezar el stream: un error a mitad del zip ya no se puede informar
+        raise HTTPException(status_code=422, detail={"message": str(exc), "diagnostics": exc.diagnostics})
 
-    payload = format_mongo_document(doc)
-    zip_file = generate_rasa_project(payload)
-    print(zip_file)
+    key = await run_in_threadpool(content_hash, graph)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "no-cache"}
 
+    # El cliente ya tiene este contenido: no se regenera ni se reenvía
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # El zip se comprime y envía por trozos (StreamingResponse itera en el threadpool)
     return StreamingResponse(
-        BytesIO(zip_file),
+        stream_export(graph, key),
         media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=rasa_project.zip"}
-    )
\ No newline at end of file
+        headers={"Content-Disposition": "attachment; filename=rasa_project.zip", **headers}
+    )
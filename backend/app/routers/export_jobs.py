@@ -0,0 +1,57 @@
+from dataclasses import asdict
+from fastapi import APIRouter, HTTPException, Response
+from bson import ObjectId
+from app.schemas.export import ExportJobStatus
+from app.services import export_jobs, flow_compile
+from starlette.concurrency import run_in_threadpool
+
+router = APIRouter(prefix="/bots", tags=["export"])
+
+@router.post("/flows/{flow_id}/export/jobs", response_model=ExportJobStatus, status_code=202)
+async def enqueue_export(flow_id: str):
+    if not ObjectId.is_valid(flow_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    doc = await flow_compile.load(ObjectId(flow_id))
+    if not doc:
+        raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    try:
+        graph = flow_compile.graph_of(doc)
+    except flow_compile.FlowInvalid as exc:
+        raise HTTPException(status_code=422, detail={"message": str(exc), "diagnostics": exc.diagnostics})
+
+    # Pedidos concurrentes del mismo contenido comparten un único job
+    job = await run_in_threadpool(export_jobs.submit_export, flow_id, graph)
+    return asdict(job)
+
+
+@router.get("/export/jobs/{job_id}", response_model=ExportJobStatus)
+async def get_export_job(job_id: str):
+    job = export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado o expirado")
+    return asdict(job)
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str):
+    job = export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado o expirado")
+    if job.status == export_jobs.FAILED:
+        raise HTTPException(status_code=500, detail=f"El export falló: {job.error}")
+    if job.status != export_jobs.DONE:
+        raise HTTPException(status_code=409, detail="El export aún no está listo")
+
+    data = export_jobs.get_artifact(job_id)
+    if data is None:
+        raise HTTPException(status_code=410, detail="El archivo ya no está disponible")
+
+    return Response(
+        content=data,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": "attachment; filename=rasa_project.zip",
+            "ETag": f'"{job.key}"',
+        },
+    )
@@ -1,24 +1,109 @@
+import asyncio
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
+import orjson
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from bson import ObjectId
 
-from app.config import db
-from app.schemas.flow import FlowCreate, FlowDB
+from app.db import db
+from starlette.concurrency import run_in_threadpool
+from app.schemas.flow import (
+    FlowCreate,
+    FlowDB,
+    FlowDiagnostics,
+    FlowHistoryEntry,
+    FlowPatch,
+    FlowSaved,
+    FlowSnapshot,
+    FlowSummary,
+    FlowUpdate,
+    FlowVersion,
+    Node,
+)
+from app.schemas.analysis import FlowAnalysis
+from app.services.analysis import analyze_flow
+from app.services import compression, flow_compile, invalidation, snapshots
+from app.services.db import flows_repo
+from app.services.db.pagination import find_page
+from app.services.flow_doc import SCHEMA_REV, SCHEMA_REV_FIELD, flow_payload
+from app.services.flow_patch import PatchError, absent_filter, build_patch_update, existing_ids, version_filter
 from app.deps import pagination_params  
 from app.utils import format_mongo_document 
 from app.routers.auth import get_current_user
+from app.settings import settings
 
 router = APIRouter(prefix="/flows", tags=["flows"])
 
+# Proyección de listados livianos (sidebar): nunca trae el diagrama
+SUMMARY_FIELDS = {"project_id": 1, "name": 1, "created_at": 1, "updated_at": 1, "version": 1}
 
-@router.post("/", response_model=FlowDB)
-def create_flow(payload: FlowCreate):
+
+async def _list(response: Response, query: dict, p: dict, projection=None):
+    docs, next_cursor = await find_page(db.flows, query, p, projection)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [format_mongo_document(d) for d in docs]
+
+
+async def _list_full(query: dict, p: dict) -> ORJSONResponse:
+    # Respuesta armada a mano: no pasa por response_model (ver flow_payload)
+    docs, next_cursor = await find_page(db.flows, query, p)
+    await snapshots.materialize_many(docs)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse([flow_payload(d) for d in docs], headers=headers)
+
+
+async def _after_save(doc: dict) -> List[dict]:
+    # Contenido recién guardado: compilación (devuelve diagnósticos) y checkpoint del historial
+    diagnostics, _ = await asyncio.gather(flow_compile.compile_saved(doc), snapshots.checkpoint_doc(doc))
+    invalidation.changed("flows", str(doc["_id"]), updated_at=doc.get("updated_at"))
+    return diagnostics
+
+
+async def _flow_response(request: Request, flow_id: str) -> Response:
+    if not ObjectId.is_valid(flow_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    encoding = compression.negotiate(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    epoch = invalidation.epoch()
+    if encoding:
+        if invalidation.trusted():
+            # Con el change stream activo lo cacheado está al día: no se consulta la versión
+            cached = compression.latest_flow(flow_id, encoding)
+        else:
+            # Con la versión (solo updated_at) alcanza para servir el cuerpo ya comprimido
+            current = await flows_repo.get_flow_version(flow_id)
+            if not current:
+                raise HTTPException(status_code=404, detail="Flujo no encontrado")
+            cached = compression.cached_flow(flow_id, current.get("updated_at"), encoding)
+        if cached is not None:
+            return Response(cached, media_type="application/json", headers={**headers, "Content-Encoding": encoding})
+
+    doc = await snapshots.materialize(await db.flows.find_one({"_id": ObjectId(flow_id)}))
+    if not doc:
+        raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    body = orjson.dumps(flow_payload(doc))
+    if encoding and len(body) >= settings.COMPRESSION_MIN_SIZE:
+        body = await compression.compress_flow(flow_id, doc.get("updated_at"), encoding, body, epoch)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _project_query(project_id: str) -> dict:
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="project_id inválido")
+    return {"project_id": str(project_id)}
+
+
+@router.post("/", response_model=FlowSaved)
+async def create_flow(payload: FlowCreate):
     # Validar que el project_id sea un ObjectId válido y que el proyecto exista
     if not ObjectId.is_valid(payload.project_id):
         raise HTTPException(status_code=400, detail="project_id inválido")
-    project = db.projects.find_one({"_id": ObjectId(payload.project_id)})
+    project = await db.projects.find_one({"_id": ObjectId(payload.project_id)})
     if not project:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
 
@@ -28,112 +113,293 @@ def create_flow(payload: FlowCreate):
     doc["project_id"] = str(payload.project_id)
     doc["created_at"] = now
     doc["updated_at"] = now
+    doc["version"] = 1
+    doc[SCHEMA_REV_FIELD] = SCHEMA_REV
 
-    res = db.flows.insert_one(doc)
-    created = db.flows.find_one({"_id": res.inserted_id})
+    res = await db.flows.insert_one(doc)
+    created = await db.flows.find_one({"_id": res.inserted_id})
+    await _after_save(created)
     # Normaliza _id a string y devuelve con el schema
     return format_mongo_document(created)
 
 
 @router.get("/", response_model=List[FlowDB])
-def list_flows(p=Depends(pagination_params)):
-    cur = db.flows.find().skip(p["skip"]).limit(p["limit"])
-    items = [format_mongo_document(d) for d in cur]
-    return items
+async def list_flows(p=Depends(pagination_params)):
+    return await _list_full({}, p)
+
+
+@router.get("/summary", response_model=List[FlowSummary])
+async def list_flow_summaries(response: Response, p=Depends(pagination_params)):
+    return await _list(response, {}, p, SUMMARY_FIELDS)
 
 
 @router.get("/by-project/{project_id}", response_model=List[FlowDB])
-def list_flows_by_project(
+async def list_flows_by_project(
     project_id: str = Path(..., description="ID de proyecto"),
     p=Depends(pagination_params),
 ):
-    if not ObjectId.is_valid(project_id):
-        raise HTTPException(status_code=400, detail="project_id inválido")
-    cur = (
-        db.flows.find({"project_id": str(project_id)})
-        .skip(p["skip"])
-        .limit(p["limit"])
-    )
-    items = [format_mongo_document(d) for d in cur]
-    return items
+    return await _list_full(_project_query(project_id), p)
+
+
+@router.get("/by-project/{project_id}/summary", response_model=List[FlowSummary])
+async def list_flow_summaries_by_project(
+    response: Response,
+    project_id: str = Path(..., description="ID de proyecto"),
+    p=Depends(pagination_params),
+):
+    return await _list(response, _project_query(project_id), p, SUMMARY_FIELDS)
 
 
 @router.get("/{flow_id}", response_model=FlowDB)
-def get_flow(flow_id: str = Path(...)):
+async def get_flow(request: Request, flow_id: str = Path(...)):
+    return await _flow_response(request, flow_id)
+
+
+@router.put("/{flow_id}", response_model=FlowSaved)
+async def update_flow(flow_id: str, payload: FlowUpdate):
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
-    doc = db.flows.find_one({"_id": ObjectId(flow_id)})
-    if not doc:
+    # Se guarda lo validado: al leer no hace falta volver a validar los nodos
+    updated_data = payload.model_dump(exclude_unset=True)
+    if "nodes" in updated_data:
+        updated_data[SCHEMA_REV_FIELD] = SCHEMA_REV
+    updated_data["updated_at"] = datetime.utcnow()
+    oid = ObjectId(flow_id)
+    content_keys = {"nodes", "metadata"} & updated_data.keys()
+    update = {"$set": updated_data, "$inc": {"version": 1} if content_keys else flow_compile.BUMP_VERSION}
+
+    if content_keys == {"nodes", "metadata"}:
+        # Reemplazo completo: un duplicado deja de depender de su snapshot
+        update["$unset"] = {snapshots.DETACHED: ""}
+        res = await db.flows.find_one_and_update({"_id": oid}, update, return_document=True)
+    elif content_keys:
+        res = await snapshots.update_inline(oid, {"_id": oid}, update, return_document=True)
+    else:
+        res = await db.flows.find_one_and_update({"_id": oid}, update, return_document=True)
+    if not res:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
-    return format_mongo_document(doc)
+
+    if content_keys:
+        await _after_save(res)
+    else:
+        # Solo nombre/estado: la compilación avanzó de versión con el mismo update; el cuerpo cacheado ya no sirve
+        invalidation.changed("flows", flow_id, updated_at=res.get("updated_at"))
+    return format_mongo_document(await snapshots.materialize(res))
 
 
-@router.put("/{flow_id}", response_model=FlowDB)
-def update_flow(flow_id: str, updated_data: dict = Body(...)):
+@router.patch("/{flow_id}", response_model=FlowVersion)
+async def patch_flow(flow_id: str, patch: FlowPatch):
+    # Cambios por nodo/edge: solo viaja el delta y se rechaza si otro cliente guardó antes
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
-    updated_data = {k: v for k, v in updated_data.items() if k != "_id"}
-    updated_data["updated_at"] = datetime.utcnow()
 
-    res = db.flows.find_one_and_update(
-        {"_id": ObjectId(flow_id)},
-        {"$set": updated_data},
+    extra = {"updated_at": datetime.utcnow()}
+    if patch.name is not None:
+        extra["name"] = patch.name
+    added = {}
+    try:
+        if patch.ops:
+            update, added = build_patch_update(patch.ops, extra)
+        else:
+            update = {"$set": extra, "$inc": flow_compile.BUMP_VERSION}
+    except (PatchError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    oid = ObjectId(flow_id)
+    res = await snapshots.update_inline(
+        oid,
+        {**version_filter(oid, patch.version), **absent_filter(added)},
+        update,
+        projection={"version": 1, "updated_at": 1},
         return_document=True,
     )
-    if not res:
+    if res:
+        # Sin el contenido: la compilación queda vencida y se rehace en la próxima lectura que la use
+        invalidation.changed("flows", flow_id, updated_at=res.get("updated_at"))
+        if patch.ops:
+            # El checkpoint relee el contenido: la respuesta sigue siendo solo la versión
+            await snapshots.checkpoint(oid)
+        return {"id": flow_id, "version": res["version"]}
+
+    projection = {"version": 1, **{f"{field}.id": 1 for field in added}}
+    current = await db.flows.find_one({"_id": oid}, projection)
+    if not current:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
-    return format_mongo_document(res)
+    if current.get("version", 0) == patch.version and added:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Ya existen elementos con esos ids", "duplicates": existing_ids(current, added)},
+        )
+    raise HTTPException(
+        status_code=409,
+        detail={"message": "El flujo fue modificado por otro cliente", "version": current.get("version", 0)},
+    )
 
 
 @router.delete("/{flow_id}")
-def delete_flow(flow_id: str):
+async def delete_flow(flow_id: str):
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
-    res = db.flows.delete_one({"_id": ObjectId(flow_id)})
+    res = await db.flows.delete_one({"_id": ObjectId(flow_id)})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    # Historial y snapshots sin otras referencias (los compartidos con duplicados quedan)
+    await snapshots.forget(flow_id)
+    invalidation.changed("flows", flow_id, deleted=True)
     return {"ok": True}
 
 
-@router.put("/{flow_id}/nodes", response_model=FlowDB)
-def update_flow_nodes(flow_id: str, nodes: list = Body(...)):
+@router.put("/{flow_id}/nodes", response_model=FlowSaved)
+async def update_flow_nodes(flow_id: str, nodes: List[Node] = Body(...)):
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    res = db.flows.find_one_and_update(
-        {"id": ObjectId(flow_id)},
-        {"$set": {"nodes": nodes, "updated_at": datetime.utcnow()}},
-        return_document=True,
+    update = {
+        "nodes": [n.model_dump() for n in nodes],
+        "updated_at": datetime.utcnow(),
+        SCHEMA_REV_FIELD: SCHEMA_REV,
+    }
+    oid = ObjectId(flow_id)
+    res = await snapshots.update_inline(
+        oid, {"_id": oid}, {"$set": update, "$inc": {"version": 1}}, return_document=True
     )
     if not res:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    await _after_save(res)
     return format_mongo_document(res)
 
 
 @router.get("/{flow_id}/detail", response_model=FlowDB)
-def get_flow_detail(flow_id: str):
+async def get_flow_detail(request: Request, flow_id: str):
+    return await _flow_response(request, flow_id)
+
+
+def _analyze(doc: dict, max_paths: int) -> dict:
+    # En el threadpool también la validación (solo la pagan los documentos viejos, ver flow_payload)
+    return analyze_flow(flow_payload(doc), max_paths)
+
+
+@router.get("/{flow_id}/analysis", response_model=FlowAnalysis)
+async def get_flow_analysis(flow_id: str, max_paths: int = Query(50, ge=0, le=1000)):
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
-    doc = db.flows.find_one({"_id": ObjectId(flow_id)})
+    doc = await snapshots.materialize(await db.flows.find_one({"_id": ObjectId(flow_id)}))
     if not doc:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
-    return format_mongo_document(doc)
+    return await run_in_threadpool(_analyze, doc, max_paths)
 
 
-@router.post("/{flow_id}/duplicate", response_model=FlowDB)
-def duplicate_flow(flow_id: str):
+@router.get("/{flow_id}/diagnostics", response_model=FlowDiagnostics)
+async def get_flow_diagnostics(flow_id: str):
+    # Los del último guardado; los flujos sin compilar se compilan ahora
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
-    doc = db.flows.find_one({"_id": ObjectId(flow_id)})
+    doc = await flow_compile.load(ObjectId(flow_id))
     if not doc:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    return {
+        "id": flow_id,
+        "version": doc.get("version", 0),
+        "valid": doc[flow_compile.COMPILED_FIELD].get("graph") is not None,
+        "diagnostics": doc.get(flow_compile.DIAGNOSTICS_FIELD) or [],
+    }
+
+
+@router.post("/{flow_id}/duplicate", response_model=FlowDB)
+async def duplicate_flow(flow_id: str):
+    if not ObjectId.is_valid(flow_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+    oid = ObjectId(flow_id)
+    # Sin copiar el diagrama: el duplicado solo referencia el snapshot del original
+    digest = await snapshots.checkpoint(oid)
+    src = await db.flows.find_one({"_id": oid}, {"nodes": 0, "metadata": 0}) if digest else None
+    # La referencia va antes del insert: si el original se borró en el medio, su snapshot ya no está
+    if not src or not await snapshots.acquire(digest):
+        raise HTTPException(status_code=404, detail="Flujo no encontrado")
 
-    doc.pop("id")
-    doc["name"] = f"{doc.get('name','flujo')} (copia)"
     now = datetime.utcnow()
-    doc["created_at"] = now
-    doc["updated_at"] = now
+    doc = {
+        "project_id": src.get("project_id"),
+        "name": f"{src.get('name', 'flujo')} (copia)",
+        "owner_id": src.get("owner_id"),
+        "created_at": now,
+        "updated_at": now,
+        "version": 1,
+        "snapshot": digest,
+        snapshots.SNAPSHOT_VERSION: 1,
+        snapshots.DETACHED: True,
+        SCHEMA_REV_FIELD: src.get(SCHEMA_REV_FIELD),
+    }
+    if flow_compile.is_current(src) and src.get(snapshots.SNAPSHOT_VERSION) == src.get("version", 0):
+        # Mismo contenido: la compilación del original sirve tal cual
+        doc[flow_compile.COMPILED_FIELD] = {**src[flow_compile.COMPILED_FIELD], "version": 1}
+        doc[flow_compile.DIAGNOSTICS_FIELD] = src.get(flow_compile.DIAGNOSTICS_FIELD) or []
+    res = await db.flows.insert_one(doc)
+    await snapshots.add_history(str(res.inserted_id), 1, digest, now)
+    return format_mongo_document(await snapshots.materialize(doc))
+
+
+@router.get("/{flow_id}/versions", response_model=List[FlowHistoryEntry])
+async def list_flow_versions(flow_id: str, limit: int = Query(50, ge=1, le=500)):
+    # Solo lectura: el historial lo escriben los guardados (y los checkpoints explícitos)
+    if not ObjectId.is_valid(flow_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+    cur = db[snapshots.HISTORY].find({"flow_id": flow_id}, {"_id": 0}).sort("version", -1).limit(limit)
+    entries = [d async for d in cur]
+    if not entries and not await db.flows.find_one({"_id": ObjectId(flow_id)}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    return entries
+
+
+@router.post("/{flow_id}/versions", response_model=FlowHistoryEntry)
+async def create_flow_version(flow_id: str):
+    # Checkpoint explícito: flujos anteriores al historial por guardado; sin cambios devuelve el último
+    if not ObjectId.is_valid(flow_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+    if await snapshots.checkpoint(ObjectId(flow_id)) is None:
+        raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    return await db[snapshots.HISTORY].find_one({"flow_id": flow_id}, {"_id": 0}, sort=[("version", -1)])
+
+
+async def _history_snapshot(flow_id: str, snapshot: str) -> dict:
+    if not ObjectId.is_valid(flow_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+    # Solo snapshots que pertenecen al historial de este flujo
+    if not await db[snapshots.HISTORY].find_one({"flow_id": flow_id, "snapshot": snapshot}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Versión no encontrada")
+    snap = await db[snapshots.SNAPSHOTS].find_one({"_id": snapshot})
+    if not snap:
+        raise HTTPException(status_code=404, detail="Versión no encontrada")
+    return snap
 
-    res = db.flows.insert_one(doc)
-    new_doc = db.flows.find_one({"_id": res.inserted_id})
-    return format_mongo_document(new_doc)
+
+@router.get("/{flow_id}/versions/{snapshot}", response_model=FlowSnapshot)
+async def get_flow_version_content(flow_id: str, snapshot: str):
+    snap = await _history_snapshot(flow_id, snapshot)
+    return {"snapshot": snapshot, **snapshots.content_of(snap)}
+
+
+@router.post("/{flow_id}/versions/{snapshot}/restore", response_model=FlowSaved)
+async def restore_flow_version(flow_id: str, snapshot: str):
+    snap = await _history_snapshot(flow_id, snapshot)
+    content = snapshots.content_of(snap)
+    # Lo que había sin checkpoint queda en el historial antes de pisarlo
+    await snapshots.checkpoint(ObjectId(flow_id))
+    res = await db.flows.find_one_and_update(
+        {"_id": ObjectId(flow_id)},
+        {
+            "$set": {**content, "updated_at": datetime.utcnow(), SCHEMA_REV_FIELD: snap.get(SCHEMA_REV_FIELD)},
+            "$unset": {snapshots.DETACHED: ""},
+            "$inc": {"version": 1},
+        },
+        return_document=True,
+    )
+    if not res:
+        raise HTTPException(status_code=404, detail="Flujo no encontrado")
+    # Volver a un contenido anterior también es una versión nueva del historial
+    await asyncio.gather(
+        snapshots.record(res["_id"], res["version"], content, snapshot, res.get("snapshot"), snap.get(SCHEMA_REV_FIELD)),
+        flow_compile.compile_saved(res),
+    )
+    invalidation.changed("flows", flow_id, updated_at=res.get("updated_at"))
+    return format_mongo_document(res)
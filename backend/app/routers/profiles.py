@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.services import profiling
+
+# Solo se monta con PROFILING_ENABLED
+router = APIRouter(prefix="/debug/profiles", tags=["debug"])
+
+
+def _get(profile_id: str) -> profiling.Profile:
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado o expirado")
+    return profile
+
+
+@router.get("/")
+def list_profiles():
+    return profiling.list_profiles()
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, top: int = Query(30, ge=1, le=500)):
+    return _get(profile_id).summary(top)
+
+
+@router.get("/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_folded(profile_id: str):
+    # Para flamegraph.pl o speedscope.app
+    return PlainTextResponse(
+        _get(profile_id).folded(),
+        headers={"Content-Disposition": f"attachment; filename=profile_{profile_id}.folded"},
+    )
@@ -1,47 +1,53 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Response
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 
-from app.config import db
+from app.db import db
 from app.deps import pagination_params
 from app.schemas.project import ProjectCreate, ProjectDB
 from app.utils import format_mongo_document
 from app.routers.auth import get_current_user
+from app.services import flow_compile
+from app.services.db.pagination import find_page
+from app.services.project_export import stream_project_export
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 @router.post("/", response_model=ProjectDB)
-def create_project(payload: ProjectCreate, user=Depends(get_current_user)):
+async def create_project(payload: ProjectCreate, user=Depends(get_current_user)):
     now = datetime.utcnow()
     doc = payload.model_dump()
     doc.update({"created_at": now, "updated_at": now, "owner_id": user["id"]})
-    res = db.projects.insert_one(doc)
-    created = db.projects.find_one({"_id": res.inserted_id})
+    res = await db.projects.insert_one(doc)
+    created = await db.projects.find_one({"_id": res.inserted_id})
     return format_mongo_document(created)
 
 @router.get("/", response_model=List[ProjectDB])
-def list_projects(p=Depends(pagination_params), user=Depends(get_current_user)):
-    cur = db.projects.find({"owner_id": user["id"]}).skip(p["skip"]).limit(p["limit"])
-    return [format_mongo_document(d) for d in cur]
+async def list_projects(response: Response, p=Depends(pagination_params), user=Depends(get_current_user)):
+    docs, next_cursor = await find_page(db.projects, {"owner_id": user["id"]}, p)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [format_mongo_document(d) for d in docs]
 
 @router.get("/{project_id}", response_model=ProjectDB)
-def get_project(project_id: str = Path(...), user=Depends(get_current_user)):
+async def get_project(project_id: str = Path(...), user=Depends(get_current_user)):
     if not ObjectId.is_valid(project_id):
         raise HTTPException(400, "project_id inválido")
-    doc = db.projects.find_one({"_id": ObjectId(project_id), "owner_id": user["id"]})
+    doc = await db.projects.find_one({"_id": ObjectId(project_id), "owner_id": user["id"]})
     if not doc:
         raise HTTPException(404, "Proyecto no encontrado")
     return format_mongo_document(doc)
 
 @router.put("/{project_id}", response_model=ProjectDB)
-def update_project(project_id: str, updated: dict = Body(...), user=Depends(get_current_user)):
+async def update_project(project_id: str, updated: dict = Body(...), user=Depends(get_current_user)):
     if not ObjectId.is_valid(project_id):
         raise HTTPException(400, "project_id inválido")
     updated = {k: v for k, v in updated.items() if k != "_id"}
     updated["updated_at"] = datetime.utcnow()
-    doc = db.projects.find_one_and_update(
+    doc = await db.projects.find_one_and_update(
         {"_id": ObjectId(project_id), "owner_id": user["id"]},
         {"$set": updated},
         return_document=True,
@@ -49,3 +55,24 @@ def update_project(project_id: str, updated: dict = Body(...), user=Depends(get_
     if not doc:
         raise HTTPException(404, "Proyecto no encontrado")
     return format_mongo_document(doc)
+
+@router.get("/{project_id}/export", response_class=StreamingResponse)
+async def export_project(project_id: str, user=Depends(get_current_user)):
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(400, "project_id inválido")
+    project = await db.projects.find_one({"_id": ObjectId(project_id), "owner_id": user["id"]})
+    if not project:
+        raise HTTPException(404, "Proyecto no encontrado")
+
+    # Una sola consulta para todos los flujos del proyecto, sin diagramas (forma compilada)
+    cur = db.flows.find({"project_id": project_id}, {**flow_compile.HEAD, "name": 1})
+    docs = await flow_compile.ensure_compiled([d async for d in cur])
+    flows = [format_mongo_document(d) for d in docs]
+    if not flows:
+        raise HTTPException(404, "El proyecto no tiene flujos")
+
+    return StreamingResponse(
+        stream_project_export(flows),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=project_{project_id}.zip"},
+    )
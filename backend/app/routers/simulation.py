@@ -1,20 +1,85 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, WebSocket
+from starlette.concurrency import run_in_threadpool
+from app.settings import settings
 from bson import ObjectId
-from app.config import db
-from app.services.simulate import simulate_flow
-from app.schemas.simulation import SimulateFlowRequest
-from app.schemas.flow import FlowDB
+from app.services.flow_compile import FlowInvalid
+from app.services.flow_graph import load_compiled_flow
+from app.services import live_simulation
+from app.services.simulate import run_scripts
+from app.services.sessions import SimulationSession, create_session, get_session, end_session
+from app.schemas.simulation import (
+    SimulateFlowRequest,
+    SimulationBatchRequest,
+    SimulationBatchResponse,
+    SimulationSessionCreate,
+    SimulationSessionResponse,
+    SimulationStepRequest,
+)
 
 router = APIRouter(prefix="/simulation", tags=["simulation"])
 
-@router.post("/{flow_id}")
-def simulate(flow_id: str, req: SimulateFlowRequest):
+
+async def _load_flow(flow_id: str):
     if not ObjectId.is_valid(flow_id):
         raise HTTPException(status_code=400, detail="ID inválido")
-
-    doc = db.flows.find_one({"_id": ObjectId(flow_id)})
-    if not doc:
+    try:
+        flow = await load_compiled_flow(flow_id)
+    except FlowInvalid as exc:
+        raise HTTPException(status_code=422, detail={"message": str(exc), "diagnostics": exc.diagnostics})
+    if flow is None:
         raise HTTPException(status_code=404, detail="Flujo no encontrado")
-    
-    flow = FlowDB(**doc)
-    return simulate_flow(req.node_id, req.value, flow)
\ No newline at end of file
+    return flow
+
+
+# Sesiones: el flujo se carga una sola vez y cada paso es trabajo en memoria
+@router.post("/sessions", response_model=SimulationSessionResponse)
+async def start_session(req: SimulationSessionCreate):
+    flow = await _load_flow(req.flow_id)
+    session = create_session(req.flow_id, flow, req.node_id)
+    try:
+        response = session.step(None)
+    except HTTPException:
+        end_session(session.id)
+        raise
+    return {"session_id": session.id, **response}
+
+
+@router.post("/sessions/{session_id}", response_model=SimulationSessionResponse)
+async def step_session(session_id: str, req: SimulationStepRequest):
+    session = get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o expirada")
+    return {"session_id": session.id, **session.step(req.value)}
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not end_session(session_id):
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o expirada")
+    return {"ok": True}
+
+
+@router.websocket("/{flow_id}/ws")
+async def simulate_socket(websocket: WebSocket, flow_id: str, node_id: str = "start-node"):
+    # Sesión atada a la conexión: se compila al conectar y cada respuesta es un paso en memoria
+    await live_simulation.serve(websocket, flow_id, node_id)
+
+
+@router.post("/{flow_id}")
+async def simulate(flow_id: str, req: SimulateFlowRequest):
+    # Endpoint sin estado: una sesión efímera que no se registra
+    session = SimulationSession(flow_id, await _load_flow(flow_id), req.node_id)
+    return session.step(req.value)
+
+
+@router.post("/{flow_id}/batch", response_model=SimulationBatchResponse)
+async def simulate_batch(flow_id: str, req: SimulationBatchRequest):
+    if len(req.scripts) > settings.SIMULATION_BATCH_MAX_SCRIPTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.SIMULATION_BATCH_MAX_SCRIPTS} guiones por lote",
+        )
+    flow = await _load_flow(flow_id)
+    scripts = [s.model_dump() for s in req.scripts]
+    results = await run_in_threadpool(run_scripts, flow, scripts)
+    return {"flow_id": flow_id, "results": results}
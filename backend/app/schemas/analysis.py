@@ -0,0 +1,39 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+class DanglingChoice(BaseModel):
+    node_id: str
+    handle: str
+    value: str
+
+class InvalidHandle(BaseModel):
+    id: Optional[str] = None
+    source: str
+    handle: str
+
+class InvalidChoice(BaseModel):
+    # Acción choice sin lista de opciones (p. ej. value="" recién agregada en el editor)
+    node_id: str
+    action: int
+
+class BrokenEdge(BaseModel):
+    id: Optional[str] = None
+    source: Optional[str] = None
+    target: Optional[str] = None
+
+class FlowAnalysis(BaseModel):
+    node_count: int
+    edge_count: int
+    start: Optional[str] = None
+    unreachable: List[str] = []
+    dead_ends: List[str] = []
+    dangling_choices: List[DanglingChoice] = []
+    invalid_handles: List[InvalidHandle] = []
+    invalid_choices: List[InvalidChoice] = []
+    broken_edges: List[BrokenEdge] = []
+    cycles: List[List[str]] = []
+    paths: List[List[str]] = []
+    paths_truncated: bool = False
+    # Saturado en PATH_COUNT_MAX (path_count_capped); None si hay un ciclo alcanzable
+    path_count: Optional[int] = None
+    path_count_capped: bool = False
@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel
+
+class ExportJobStatus(BaseModel):
+    id: str
+    flow_id: str
+    status: Literal["pending", "done", "failed"]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
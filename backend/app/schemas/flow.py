@@ -1,4 +1,5 @@
-from typing import Any, Dict, List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field, field_validator
 from .common import BaseDBModel, NodeType
 
@@ -18,9 +19,65 @@ class FlowCreate(BaseModel):
     nodes: List[Node] = []
     metadata: Dict[str, Any] = {}
 
+class FlowUpdate(BaseModel):
+    # Campos editables por PUT; lo demás (ids, fechas, version) lo maneja el servidor
+    project_id: Optional[str] = Field(default=None, min_length=1)
+    name: Optional[str] = Field(default=None, min_length=1, max_length=80)
+    nodes: Optional[List[Node]] = None
+    metadata: Optional[Dict[str, Any]] = None
+
 class FlowDB(BaseDBModel):
     project_id: str
     name: str
     nodes: List[Node]
     metadata: Dict[str, Any] = {}
     owner_id: Optional[str] = None
+    version: int = 0
+
+class FlowDiagnostic(BaseModel):
+    level: Literal["error", "warning"]
+    code: str
+    message: str
+    node_id: Optional[str] = None
+    edge_id: Optional[str] = None
+
+class FlowSaved(FlowDB):
+    # Respuesta de las escrituras: el GET no los incluye (su cuerpo se cachea por versión)
+    diagnostics: List[FlowDiagnostic] = []
+
+class FlowDiagnostics(BaseModel):
+    id: str
+    version: int
+    valid: bool
+    diagnostics: List[FlowDiagnostic] = []
+
+class FlowSummary(BaseDBModel):
+    # Lo que necesita un listado: sin nodes ni metadata
+    project_id: str
+    name: str
+    version: int = 0
+
+class FlowPatchOp(BaseModel):
+    op: Literal["add", "update", "remove"]
+    target: Literal["node", "edge"]
+    id: Optional[str] = None
+    value: Dict[str, Any] = {}
+
+class FlowPatch(BaseModel):
+    version: int = Field(ge=0)
+    ops: List[FlowPatchOp] = Field(default_factory=list, max_length=5000)
+    name: Optional[str] = Field(default=None, min_length=1, max_length=80)
+
+class FlowVersion(BaseModel):
+    id: str
+    version: int
+
+class FlowHistoryEntry(BaseModel):
+    version: int
+    snapshot: str
+    created_at: datetime
+
+class FlowSnapshot(BaseModel):
+    snapshot: str
+    nodes: List[Node]
+    metadata: Dict[str, Any] = {}
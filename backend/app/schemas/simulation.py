@@ -1,5 +1,46 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 class SimulateFlowRequest(BaseModel):
     value: str
-    node_id: str
\ No newline at end of file
+    node_id: str
+
+class SimulationSessionCreate(BaseModel):
+    flow_id: str
+    node_id: str = "start-node"
+
+class SimulationStepRequest(BaseModel):
+    value: str
+
+class SimulationChoice(BaseModel):
+    id: Optional[str] = None
+    value: str
+
+class SimulationSessionResponse(BaseModel):
+    session_id: str
+    node_id: Optional[str] = None
+    messages: List[str] = []
+    choices: List[SimulationChoice] = []
+
+class SimulationScript(BaseModel):
+    values: List[str]
+    node_id: str = "start-node"
+
+class SimulationBatchRequest(BaseModel):
+    scripts: List[SimulationScript]
+
+class SimulationStep(BaseModel):
+    value: Optional[str] = None
+    node_id: Optional[str] = None
+    messages: List[str] = []
+    choices: List[SimulationChoice] = []
+
+class SimulationTranscript(BaseModel):
+    steps: List[SimulationStep]
+    visited: List[str]
+    completed: bool
+    error: Optional[str] = None
+
+class SimulationBatchResponse(BaseModel):
+    flow_id: str
+    results: List[SimulationTranscript]
@@ -0,0 +1,252 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from app.services.flow_compile import choice_handle, choice_list
+
+START_NODE = "start-node"
+# Tope del conteo de caminos: alcanza para "demasiados" y se mantiene en un entero chico
+PATH_COUNT_MAX = 10 ** 6
+
+
+# Sucesores por nodo sin repetir y en orden de aparición (dict como conjunto ordenado)
+Adjacency = Dict[str, Dict[str, None]]
+
+
+def _walk(adj: Adjacency, roots: List[str]) -> Tuple[set, List[str], bool]:
+    # DFS iterativo desde las raíces -> (alcanzables, postorden, si hay un ciclo alcanzable)
+    seen = set(roots)
+    on_path = set()
+    postorder: List[str] = []
+    cyclic = False
+    for root in roots:
+        # Pilas paralelas (nodo, iterador): sin una tupla por nodo visitado
+        work = [root]
+        iters = [iter(adj[root])]
+        on_path.add(root)
+        while work:
+            for child in iters[-1]:
+                if child not in seen:
+                    seen.add(child)
+                    on_path.add(child)
+                    work.append(child)
+                    iters.append(iter(adj[child]))
+                    break
+                if child in on_path:
+                    cyclic = True
+            else:
+                iters.pop()
+                node = work.pop()
+                on_path.discard(node)
+                postorder.append(node)
+    return seen, postorder, cyclic
+
+
+def _cycles(adj: Adjacency, candidates: List[str]) -> List[List[str]]:
+    # Tarjan iterativo desde los candidatos: componentes fuertemente conexas con ciclo real
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    on_stack = set()
+    stack: List[str] = []
+    result = []
+    counter = 0
+
+    for root in candidates:
+        if root in index:
+            continue
+        # Pilas paralelas (nodo, iterador): sin una tupla por nodo visitado
+        work = [root]
+        iters = [iter(adj[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node = work[-1]
+            advanced = False
+            for child in iters[-1]:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append(child)
+                    iters.append(iter(adj[child]))
+                    advanced = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            if advanced:
+                continue
+
+            work.pop()
+            iters.pop()
+            if work:
+                parent = work[-1]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in adj[node]:
+                    result.append(component[::-1])
+    return result
+
+
+def _count_paths(adj: Adjacency, postorder: List[str], root: str, ends: set) -> int:
+    # DP en postorden (sin ciclos alcanzables), saturado en PATH_COUNT_MAX: siempre enteros chicos
+    count: Dict[str, int] = {}
+    for node in postorder:
+        if node in ends:
+            count[node] = 1
+            continue
+        total = 0
+        for child in adj[node]:
+            total += count[child]
+        count[node] = total if total < PATH_COUNT_MAX else PATH_COUNT_MAX
+    return count[root]
+
+
+def _enumerate_paths(adj: Adjacency, root: str, ends: set, max_paths: int, budget: int):
+    # DFS iterativo de caminos simples, acotado por cantidad y por pasos
+    paths: List[List[str]] = []
+    path = [root]
+    on_path = {root}
+    work = [iter(adj[root])]
+    steps = 0
+    while work:
+        if len(paths) >= max_paths or steps >= budget:
+            return paths, True
+        steps += 1
+        nxt = next(work[-1], None)
+        if nxt is None:
+            work.pop()
+            on_path.discard(path.pop())
+            continue
+        if nxt in on_path:
+            continue
+        if nxt in ends:
+            paths.append(path + [nxt])
+            continue
+        path.append(nxt)
+        on_path.add(nxt)
+        work.append(iter(adj[nxt]))
+    return paths, False
+
+
+def analyze_flow(flow: dict, max_paths: int = 50) -> dict:
+    """Flujo como lo devuelve flow_payload (nodes + metadata) -> reporte de FlowAnalysis."""
+    nodes: Dict[str, dict] = {}
+    for n in flow.get("nodes") or []:
+        nodes[n["id"]] = n
+    adj: Adjacency = {node_id: {} for node_id in nodes}
+    edge_count = 0
+    has_default = set()
+    broken_edges = []
+    invalid_handles = []
+    invalid_choices = []
+    # nodo -> capture_idx (mismo índice que los handles choice-i-j) -> (posición de la primera opción, opciones)
+    choices: Dict[str, Dict[int, Tuple[int, List[str]]]] = {}
+    # Todas las opciones numeradas en orden: la posición de cada capture y a quién pertenece
+    starts: List[int] = []
+    owners: List[Tuple[str, int, List[str]]] = []
+    option_count = 0
+    for node_id, n in nodes.items():
+        if n.get("type") != "ActionNode":
+            continue
+        for idx, action in enumerate((n.get("data") or {}).get("actions") or ()):
+            if not isinstance(action, dict):
+                continue
+            if action.get("type") == "capture-info" and action.get("subtype") == "choice":
+                # Mismo criterio que la compilación: value="" (recién agregada en el editor) no es una lista
+                options = choice_list(action)
+                if options is None:
+                    invalid_choices.append({"node_id": node_id, "action": idx})
+                else:
+                    choices.setdefault(node_id, {})[idx] = (option_count, options)
+                    starts.append(option_count)
+                    owners.append((node_id, idx, options))
+                    option_count += len(options)
+    # Opciones con edge propio, por posición: sin una clave armada por edge
+    covered = bytearray(option_count)
+
+    for edge in (flow.get("metadata") or {}).get("edges") or []:
+        source, target = edge.get("source"), edge.get("target")
+        if source not in nodes or target not in nodes:
+            broken_edges.append({"id": edge.get("id"), "source": source, "target": target})
+            continue
+
+        handle = edge.get("sourceHandle")
+        if not handle:
+            has_default.add(source)
+        else:
+            # Mismo criterio que la compilación (flow_compile.check_flow)
+            parsed = choice_handle(handle)
+            if parsed:
+                capture_idx, option_idx = parsed
+                captures = choices.get(source)
+                slot = captures.get(capture_idx) if captures else None
+                if slot is None or option_idx >= len(slot[1]):
+                    invalid_handles.append({"id": edge.get("id"), "source": source, "handle": handle})
+                    continue
+                covered[slot[0] + option_idx] = 1
+        # Sin aristas repetidas: ciclos y caminos se calculan sobre sucesores únicos
+        edge_count += 1
+        adj[source][target] = None
+
+    roots = [START_NODE] if START_NODE in nodes else [i for i, n in nodes.items() if n.get("type") == "StartNode"]
+    ends = {i for i, n in nodes.items() if n.get("type") == "EndNode"}
+    reachable, postorder, cyclic = _walk(adj, roots)
+
+    unreachable = [node_id for node_id in nodes if node_id not in reachable]
+    dead_ends = [
+        node_id for node_id, n in nodes.items()
+        if n.get("type") != "EndNode" and not adj[node_id]
+    ]
+    dangling_choices = []
+    # Solo se visitan las opciones sin edge (en orden de nodo, capture y opción)
+    position = covered.find(0)
+    while position != -1:
+        k = bisect_right(starts, position) - 1
+        node_id, capture_idx, options = owners[k]
+        if node_id not in has_default:
+            option_idx = position - starts[k]
+            dangling_choices.append({
+                "node_id": node_id,
+                "handle": f"choice-{capture_idx}-{option_idx}",
+                "value": options[option_idx],
+            })
+        position = covered.find(0, position + 1)
+
+    # Sin ciclo alcanzable, una componente con ciclo solo puede estar entre los inalcanzables
+    cycles = _cycles(adj, list(nodes) if cyclic else unreachable)
+    paths: List[List[str]] = []
+    truncated = False
+    path_count: Optional[int] = None
+    if roots:
+        root = roots[0]
+        budget = 10 * (len(nodes) + sum(map(len, adj.values())))
+        paths, truncated = _enumerate_paths(adj, root, ends, max_paths, budget)
+        if not cyclic:
+            path_count = _count_paths(adj, postorder, root, ends)
+
+    return {
+        "node_count": len(nodes),
+        "edge_count": edge_count,
+        "start": roots[0] if roots else None,
+        "unreachable": unreachable,
+        "dead_ends": dead_ends,
+        "dangling_choices": dangling_choices,
+        "invalid_handles": invalid_handles,
+        "invalid_choices": invalid_choices,
+        "broken_edges": broken_edges,
+        "cycles": cycles,
+        "paths": paths,
+        "paths_truncated": truncated,
+        "path_count": path_count,
+        "path_count_capped": path_count == PATH_COUNT_MAX,
+    }
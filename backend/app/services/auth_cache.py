@@ -0,0 +1,54 @@
+import time
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+
+from app.db import db
+from app.services.cache import TTLCache
+from app.services.security import decode_token
+from app.settings import settings
+from app.utils import format_mongo_document
+
+# token -> claims ya verificados; nunca sobreviven al exp del propio token
+_tokens = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+# user id -> documento formateado (TTL corto; se invalida al modificar el usuario)
+_users = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+def get_claims(token: str) -> Optional[Dict[str, Any]]:
+    claims = _tokens.get(token)
+    if claims is not None:
+        return claims
+
+    claims = decode_token(token)
+    if not claims:
+        return None
+    exp = claims.get("exp")
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if exp is not None:
+        ttl = min(ttl, exp - time.time())
+    if ttl > 0:
+        _tokens.set(token, claims, ttl=ttl)
+    return claims
+
+
+async def get_user(uid: str) -> Optional[Dict[str, Any]]:
+    user = _users.get(uid)
+    if user is None:
+        if not ObjectId.is_valid(uid):
+            return None
+        doc = await db.users.find_one({"_id": ObjectId(uid)}, {"password": 0})
+        if not doc:
+            return None
+        user = format_mongo_document(doc)
+        _users.set(uid, user)
+    # Copia: el llamador puede modificar el dict sin tocar el cache
+    return dict(user)
+
+
+def invalidate_user(uid: str) -> None:
+    _users.pop(uid)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {"tokens": _tokens.stats(), "users": _users.stats()}
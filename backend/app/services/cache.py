@@ -0,0 +1,106 @@
+from collections import OrderedDict
+import time
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Cache en memoria acotado (LRU) y seguro entre hilos, con contadores de aciertos."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class TTLCache(LRUCache):
+    """LRU con expiración por entrada. Con ``sliding`` cada lectura renueva el TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, sliding: bool = False):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.sliding = sliding
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        value = self._get(key, count=True)
+        return default if value is _MISSING else value
+
+    def _get(self, key: Hashable, count: bool = False) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[1] <= now:
+                del self._data[key]
+                item = _MISSING
+            if item is _MISSING:
+                self.misses += count
+                return _MISSING
+            self.hits += count
+            value, _, ttl = item
+            if self.sliding:
+                self._data[key] = (value, now + ttl, ttl)
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        super().set(key, (value, time.monotonic() + ttl, ttl))
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        item = super().pop(key, _MISSING)
+        return default if item is _MISSING else item[0]
+
+    def purge(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (_, expires_at, _) in self._data.items() if expires_at <= now]
+            for k in expired:
+                del self._data[k]
+        return len(expired)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # No cuenta como acierto/fallo: no es una lectura del valor
+        return self._get(key) is not _MISSING
@@ -0,0 +1,96 @@
+import gzip
+from datetime import datetime
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services import invalidation
+from app.services.cache import LRUCache
+from app.settings import settings
+
+try:  # brotli viene en requirements.txt; si falta en el entorno se negocia solo gzip
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# Tipos que vale la pena comprimir (zip, imágenes, etc. ya vienen comprimidos)
+COMPRESSIBLE = ("application/json", "text/", "application/x-yaml", "application/javascript")
+
+# (flow_id, encoding) -> (updated_at, cuerpo comprimido): se paga una vez por versión
+_cache = LRUCache(maxsize=settings.COMPRESSION_CACHE_SIZE)
+
+
+def _accepted(accept_encoding: str) -> dict:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Mejor codificación aceptada por el cliente: br > gzip > ninguna."""
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime fijo: mismo contenido, mismos bytes
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def cached_flow(flow_id: str, updated_at: Optional[datetime], encoding: str) -> Optional[bytes]:
+    # Solo si lo cacheado es de esa versión
+    entry = _cache.get((flow_id, encoding))
+    if entry is None or updated_at is None or entry[0] != updated_at:
+        return None
+    return entry[1]
+
+
+def latest_flow(flow_id: str, encoding: str) -> Optional[bytes]:
+    # Sin comparar versión: solo vale mientras invalidation.trusted()
+    entry = _cache.get((flow_id, encoding))
+    return entry[1] if entry is not None else None
+
+
+async def compress_flow(flow_id: str, updated_at: Optional[datetime], encoding: str, body: bytes, epoch: int) -> bytes:
+    data = await run_in_threadpool(compress, body, encoding)
+    # Sin updated_at no hay forma de saber si cambió; con otra época el cuerpo pudo quedar viejo
+    if updated_at is not None and epoch == invalidation.epoch():
+        _cache.set((flow_id, encoding), (updated_at, data))
+    return data
+
+
+def _evict(flow_id: str, deleted: bool) -> None:
+    for encoding in ("br", "gzip"):
+        _cache.pop((flow_id, encoding))
+
+
+invalidation.register(
+    "flows", _evict, tracked=lambda: {flow_id for flow_id, _ in _cache.keys()}, reset=_cache.clear
+)
+
+
+def stats() -> dict:
+    return _cache.stats()
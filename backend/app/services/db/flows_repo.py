@@ -0,0 +1,11 @@
+from typing import Optional, Dict, Any
+from bson import ObjectId
+from app.db import db
+
+COLLECTION = "flows"
+
+async def get_flow_version(flow_id: str) -> Optional[Dict[str, Any]]:
+    # Solo _id y updated_at: sirve para validar caches sin traer el diagrama
+    if not ObjectId.is_valid(flow_id):
+        return None
+    return await db[COLLECTION].find_one({"_id": ObjectId(flow_id)}, {"updated_at": 1})
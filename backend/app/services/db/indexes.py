@@ -0,0 +1,46 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Índices que necesitan las consultas de la app (create_indexes es idempotente)
+INDEXES = {
+    "flows": [
+        # Listados por proyecto, paginados por _id o por updated_at (order=recent)
+        IndexModel([("project_id", ASCENDING), ("_id", ASCENDING)], name="project_id_id"),
+        IndexModel(
+            [("project_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="project_id_recent",
+        ),
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="recent"),
+    ],
+    "projects": [
+        IndexModel([("owner_id", ASCENDING), ("_id", ASCENDING)], name="owner_id_id"),
+        IndexModel(
+            [("owner_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="owner_id_recent",
+        ),
+    ],
+    "flow_history": [
+        # Historial de un flujo, de la versión más nueva a la más vieja
+        IndexModel([("flow_id", ASCENDING), ("version", DESCENDING)], name="flow_id_version"),
+    ],
+    "users": [
+        # Único: además de acelerar el login evita registros duplicados concurrentes
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+}
+
+
+async def ensure_indexes(database) -> None:
+    for collection, models in INDEXES.items():
+        try:
+            await database[collection].create_indexes(models)
+        except ConnectionFailure:
+            logger.warning("Mongo no disponible: índices no verificados")
+            return
+        except PyMongoError:
+            # Sin índices la app funciona igual (más lenta): se registra y se sigue
+            logger.exception("No se pudieron crear los índices de %s", collection)
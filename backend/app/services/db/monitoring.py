@@ -0,0 +1,118 @@
+import logging
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.services import metrics, profiling
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Dónde está el filtro dentro de cada comando
+_FILTER_KEYS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+}
+
+
+def query_shape(value: Any) -> Any:
+    # Conserva campos y operadores, reemplaza valores: agrupa consultas iguales y no loguea datos
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(v) for v in value[:3]]
+    return 1
+
+
+def _filter_of(name: str, command) -> Any:
+    key = _FILTER_KEYS.get(name)
+    if key is not None:
+        return command.get(key)
+    # update / delete: filtro de la primera sentencia del lote
+    statements = command.get(name + "s") if name in ("update", "delete") else None
+    if statements:
+        return statements[0].get("q")
+    return None
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Tiempos por colección/operación para /metrics; registra y cuenta los que superan ``threshold_ms``."""
+
+    def __init__(self, threshold_ms: float, record_metrics: bool = True):
+        # Umbral <= 0: sin log de lentos
+        self.threshold_us = threshold_ms * 1000 if threshold_ms > 0 else float("inf")
+        self.record_metrics = record_metrics
+        self.record_profiles = settings.PROFILING_ENABLED
+        self.counts: Counter = Counter()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Any]] = {}
+        self._lock = Lock()
+
+    def started(self, event):
+        # Solo se guarda la referencia; la forma del filtro se calcula si el comando fue lento
+        collection = event.command.get(event.command_name)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                collection if isinstance(collection, str) else None,
+                event.command,
+            )
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+
+        collection, command = pending
+        name = event.command_name
+        if self.record_metrics:
+            metrics.mongo_latency.observe(collection or "", name, value=event.duration_micros / 1e6)
+            if failed:
+                metrics.mongo_failures.inc(collection or "", name)
+        if self.record_profiles:
+            profiling.record_mongo(event.duration_micros / 1e6)
+        if event.duration_micros < self.threshold_us:
+            return
+
+        with self._lock:
+            self.counts[(name, collection)] += 1
+        logger.warning(
+            "Comando Mongo lento: %s %s.%s %.1f ms%s filtro=%s",
+            name,
+            event.database_name,
+            collection,
+            event.duration_micros / 1000,
+            " (falló)" if failed else "",
+            query_shape(_filter_of(name, command)),
+        )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def stats(self) -> Dict[Tuple[str, str], int]:
+        # (colección, comando) -> lentos: mismas etiquetas que mongo_command_duration_seconds
+        with self._lock:
+            return {(collection or "", name): n for (name, collection), n in self.counts.items()}
+
+
+_monitor: Optional[CommandMonitor] = None
+
+
+def get_listeners() -> list:
+    global _monitor
+    if settings.MONGO_SLOW_QUERY_MS <= 0 and not (settings.METRICS_ENABLED or settings.PROFILING_ENABLED):
+        return []
+    if _monitor is None:
+        _monitor = CommandMonitor(settings.MONGO_SLOW_QUERY_MS, record_metrics=settings.METRICS_ENABLED)
+    return [_monitor]
+
+
+def slow_command_stats() -> Dict[Tuple[str, str], int]:
+    return _monitor.stats() if _monitor is not None else {}
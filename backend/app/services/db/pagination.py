@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+# Orden estable por clave única: el cursor apunta al último elemento entregado
+SORTS = {
+    "id": [("_id", 1)],
+    "recent": [("updated_at", -1), ("_id", -1)],
+}
+
+
+def encode_cursor(order: str, doc: dict) -> str:
+    raw = {"o": order, "id": str(doc["_id"])}
+    if order == "recent":
+        updated_at = doc.get("updated_at")
+        raw["u"] = updated_at.isoformat() if updated_at else None
+    return base64.urlsafe_b64encode(json.dumps(raw, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        decoded = {"order": raw["o"], "_id": ObjectId(raw["id"])}
+        if raw["o"] == "recent":
+            decoded["updated_at"] = datetime.fromisoformat(raw["u"]) if raw.get("u") else None
+        elif raw["o"] != "id":
+            raise ValueError(raw["o"])
+    except Exception:
+        raise ValueError("cursor inválido")
+    return decoded
+
+
+def _after(cursor: Dict[str, Any]) -> dict:
+    if cursor["order"] == "id":
+        return {"_id": {"$gt": cursor["_id"]}}
+    updated_at = cursor["updated_at"]
+    if updated_at is None:
+        # Documentos sin updated_at quedan al final (null ordena antes que cualquier fecha)
+        return {"updated_at": None, "_id": {"$lt": cursor["_id"]}}
+    return {"$or": [
+        {"updated_at": {"$lt": updated_at}},
+        {"updated_at": None},
+        {"updated_at": updated_at, "_id": {"$lt": cursor["_id"]}},
+    ]}
+
+
+async def find_page(
+    collection,
+    query: dict,
+    p: Dict[str, Any],
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Una página de `collection`; con cursor no hay skip y el costo no crece con la profundidad."""
+    order = p["order"]
+    cursor = p.get("cursor")
+    if cursor is not None:
+        query = {"$and": [query, _after(cursor)]} if query else _after(cursor)
+
+    # Se pide uno de más para saber si hay otra página sin contar documentos
+    find = collection.find(query, projection).sort(SORTS[order]).limit(p["limit"] + 1)
+    if cursor is None and p["skip"]:
+        find = find.skip(p["skip"])
+    docs = [d async for d in find]
+
+    next_cursor = None
+    if len(docs) > p["limit"]:
+        docs = docs[:p["limit"]]
+        next_cursor = encode_cursor(order, docs[-1])
+    return docs, next_cursor
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+from typing import Iterator, List, Optional, Tuple
+
+from app.services.cache import LRUCache
+from app.services.rasa import GENERATOR_VERSION, stream_rasa_project
+from app.settings import settings
+
+# Exports indexados por hash de contenido: mismo flujo + mismas opciones => mismo zip
+_memory = LRUCache(maxsize=settings.EXPORT_CACHE_SIZE)
+# Archivos sueltos por flujo (sin comprimir), para armar exports combinados
+_files = LRUCache(maxsize=settings.EXPORT_CACHE_SIZE)
+
+
+def content_hash(graph: dict, options: Optional[dict] = None) -> str:
+    # Solo lo que afecta la salida (el grafo compilado): ni ids, ni nombres, ni timestamps
+    payload = {
+        "generator": GENERATOR_VERSION,
+        "graph": graph,
+        "options": options or {},
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _disk_path(key: str) -> Optional[str]:
+    if not settings.EXPORT_CACHE_DIR:
+        return None
+    return os.path.join(settings.EXPORT_CACHE_DIR, f"{key}.zip")
+
+
+def _read_disk(key: str) -> Optional[bytes]:
+    path = _disk_path(key)
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _iter_disk(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(settings.EXPORT_CHUNK_SIZE):
+            yield chunk
+
+
+def _write_disk(key: str, data: bytes) -> None:
+    path = _disk_path(key)
+    if not path:
+        return
+    os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+    # Escritura atómica: otro proceso nunca ve un zip a medio escribir
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def lookup(key: str) -> Optional[bytes]:
+    data = _memory.get(key)
+    if data is None:
+        data = _read_disk(key)
+        if data is not None and len(data) <= settings.EXPORT_CACHE_MAX_BYTES:
+            _memory.set(key, data)
+    return data
+
+
+def store(key: str, data: bytes) -> None:
+    _write_disk(key, data)
+    if len(data) <= settings.EXPORT_CACHE_MAX_BYTES:
+        _memory.set(key, data)
+
+
+def lookup_files(key: str) -> Optional[List[Tuple[str, bytes]]]:
+    return _files.get(key)
+
+
+def store_files(key: str, files: List[Tuple[str, bytes]]) -> None:
+    if sum(len(data) for _, data in files) <= settings.EXPORT_CACHE_MAX_BYTES:
+        _files.set(key, files)
+
+
+def stream_export(graph: dict, key: Optional[str] = None) -> Iterator[bytes]:
+    key = key or content_hash(graph)
+    data = _memory.get(key)
+    if data is not None:
+        view = memoryview(data)
+        for start in range(0, len(view), settings.EXPORT_CHUNK_SIZE):
+            yield view[start:start + settings.EXPORT_CHUNK_SIZE]
+        return
+
+    path = _disk_path(key)
+    if path and os.path.exists(path):
+        yield from _iter_disk(path)
+        return
+
+    # Se genera mientras se envía; solo los zips chicos se quedan en memoria
+    parts: Optional[list] = []
+    size = 0
+    tmp = None
+    if path:
+        os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+        tmp = open(f"{path}.{os.getpid()}.{id(parts)}.tmp", "wb")
+    try:
+        for chunk in stream_rasa_project(graph):
+            yield chunk
+            if tmp:
+                tmp.write(chunk)
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > settings.EXPORT_CACHE_MAX_BYTES:
+                    parts = None
+        if tmp:
+            tmp.close()
+            os.replace(tmp.name, path)
+            tmp = None
+        if parts is not None:
+            _memory.set(key, b"".join(parts))
+    finally:
+        # Descarga interrumpida: no dejar archivos temporales a medias
+        if tmp:
+            tmp.close()
+            os.remove(tmp.name)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,117 @@
+import secrets
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Optional
+
+from app.services import export_cache
+from app.services.cache import TTLCache
+from app.services.rasa import generate_rasa_project
+from app.settings import settings
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class ExportJob:
+    id: str
+    key: str
+    flow_id: str
+    status: str = PENDING
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+
+# Jobs y artefactos viven EXPORT_JOB_TTL segundos desde que se crean / terminan
+_jobs = TTLCache(maxsize=settings.EXPORT_JOB_MAX, ttl=settings.EXPORT_JOB_TTL)
+_artifacts = TTLCache(maxsize=settings.EXPORT_JOB_MAX, ttl=settings.EXPORT_JOB_TTL)
+# Single-flight: hash de contenido -> job en curso o terminado
+_by_key: Dict[str, str] = {}
+_lock = Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    # submit_export corre en el threadpool: dos pedidos simultáneos no deben crear dos pools
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.EXPORT_WORKERS)
+        return _pool
+
+
+def _finish(job: ExportJob, data: Optional[bytes] = None, error: Optional[str] = None) -> None:
+    job.finished_at = datetime.utcnow()
+    if error is not None:
+        job.status = FAILED
+        job.error = error
+        # Un fallo no se reutiliza: el próximo pedido vuelve a intentar
+        with _lock:
+            if _by_key.get(job.key) == job.id:
+                del _by_key[job.key]
+        return
+    _artifacts.set(job.id, data)
+    job.size = len(data)
+    job.status = DONE
+
+
+def _on_done(job: ExportJob, future: Future) -> None:
+    # Cancelado por shutdown() o por el pool roto: exception() lanzaría CancelledError
+    if future.cancelled():
+        _finish(job, error="cancelled")
+        return
+    exc = future.exception()
+    if exc is not None:
+        _finish(job, error=str(exc) or type(exc).__name__)
+        return
+    data = future.result()
+    export_cache.store(job.key, data)
+    _finish(job, data)
+
+
+def submit_export(flow_id: str, graph: dict) -> ExportJob:
+    # Al worker viaja solo el grafo compilado, no el diagrama
+    key = export_cache.content_hash(graph)
+
+    with _lock:
+        existing = _jobs.get(_by_key.get(key))
+        if existing is not None and existing.status != FAILED:
+            return existing
+
+        job = ExportJob(id=secrets.token_urlsafe(12), key=key, flow_id=flow_id)
+        _jobs.set(job.id, job)
+        _by_key[key] = job.id
+        if len(_by_key) > settings.EXPORT_JOB_MAX:
+            for stale in [k for k, job_id in _by_key.items() if job_id not in _jobs]:
+                del _by_key[stale]
+
+    cached = export_cache.lookup(key)
+    if cached is not None:
+        _finish(job, cached)
+        return job
+
+    future = get_pool().submit(generate_rasa_project, graph)
+    future.add_done_callback(lambda f: _on_done(job, f))
+    return job
+
+
+def get_job(job_id: str) -> Optional[ExportJob]:
+    return _jobs.get(job_id)
+
+
+def get_artifact(job_id: str) -> Optional[bytes]:
+    return _artifacts.get(job_id)
+
+
+def shutdown() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    # Fuera del lock: cancelar dispara _on_done, que vuelve a tomar _lock
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
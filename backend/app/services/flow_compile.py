@@ -0,0 +1,232 @@
+"""Validación y compilación de flujos al guardarlos.
+
+Cada escritura de contenido deja junto al documento los diagnósticos y, si no hay
+errores, una forma compilada compacta (adyacencia, opciones, destino inicial, intents).
+Simulación y export leen esa forma en lugar de recorrer nodos y edges en cada pedido.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+
+from app.db import db
+from app.services import snapshots
+from app.services.flow_patch import version_filter
+
+CHOICE_HANDLE = re.compile(r"choice-(\d+)-(\d+)")
+START_NODE = "start-node"
+
+# Subir al cambiar el formato compilado o los diagnósticos: los documentos se recompilan al leerse
+COMPILE_REV = 2
+COMPILED_FIELD = "compiled"
+DIAGNOSTICS_FIELD = "diagnostics"
+# Lo mínimo para decidir si hace falta traer el diagrama
+HEAD = {"version": 1, "updated_at": 1, COMPILED_FIELD: 1, DIAGNOSTICS_FIELD: 1}
+# $inc para guardados que no tocan el contenido (nombre): la compilación vigente sigue
+# vigente en la versión nueva y una vencida sigue vencida
+BUMP_VERSION = {"version": 1, f"{COMPILED_FIELD}.version": 1}
+
+ERROR = "error"
+WARNING = "warning"
+
+
+class FlowInvalid(ValueError):
+    def __init__(self, diagnostics: List[dict]):
+        self.diagnostics = diagnostics
+        errors = [d["message"] for d in diagnostics if d["level"] == ERROR]
+        super().__init__(errors[0] if errors else "El flujo no es válido")
+
+
+@lru_cache(maxsize=4096)
+def choice_handle(handle: str) -> Optional[Tuple[int, int]]:
+    """"choice-i-j" -> (i, j); None si el handle no es de una opción.
+
+    Cacheado: los handles se repiten en todo el diagrama y así no se crea un Match por edge.
+    """
+    match = CHOICE_HANDLE.search(handle)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def choice_intent(label: str) -> str:
+    return f"choice_{label.lower().replace(' ', '_')}"
+
+
+def _diag(level: str, code: str, message: str, node_id=None, edge_id=None) -> dict:
+    return {"level": level, "code": code, "message": message, "node_id": node_id, "edge_id": edge_id}
+
+
+def choice_list(action: dict) -> Optional[List[str]]:
+    # Una acción choice recién agregada en el editor trae value="" en vez de {"choices": [...]}
+    value = action.get("value")
+    choices = value.get("choices") if isinstance(value, dict) else None
+    if isinstance(choices, list) and all(isinstance(c, str) for c in choices):
+        return choices
+    return None
+
+
+def check_flow(flow: dict) -> Tuple[List[dict], Optional[dict]]:
+    """Una pasada por nodos y edges -> (diagnósticos, grafo compilado o None si hay errores)."""
+    diagnostics: List[dict] = []
+    ids = set()
+    nodes = []  # [id, tipo, [[subtype, valor]]]
+    options: Dict[str, list] = {}  # nodo -> [[capture_idx, option_idx, valor]]
+    captures: Dict[str, Dict[int, int]] = {}  # nodo -> capture_idx -> cantidad de opciones
+
+    for node in flow.get("nodes") or []:
+        node_id, node_type = node.get("id"), node.get("type")
+        if node_id in ids:
+            diagnostics.append(_diag(ERROR, "duplicate_node", f"Hay más de un nodo con id {node_id!r}", node_id=node_id))
+            continue
+        ids.add(node_id)
+
+        messages = []
+        if node_type == "ActionNode":
+            for idx, action in enumerate((node.get("data") or {}).get("actions") or []):
+                kind = action.get("type") if isinstance(action, dict) else None
+                if kind == "message":
+                    messages.append([action.get("subtype"), action.get("value")])
+                elif kind == "capture-info" and action.get("subtype") == "choice":
+                    choices = choice_list(action)
+                    if choices is None:
+                        diagnostics.append(_diag(
+                            ERROR, "invalid_choice",
+                            f"La acción {idx} del nodo {node_id!r} no tiene una lista de opciones",
+                            node_id=node_id,
+                        ))
+                        continue
+                    captures.setdefault(node_id, {})[idx] = len(choices)
+                    options.setdefault(node_id, []).extend([idx, i, value] for i, value in enumerate(choices))
+        nodes.append([node_id, node_type, messages])
+
+    start = None
+    transitions: Dict[Tuple[str, int, int], str] = {}
+    defaults: Dict[str, str] = {}
+    # Se respeta el primer edge encontrado (mismo criterio en simulación y export)
+    for edge in (flow.get("metadata") or {}).get("edges") or []:
+        source, target, edge_id = edge.get("source"), edge.get("target"), edge.get("id")
+        if source not in ids or target not in ids:
+            # Resto de un nodo borrado: no se sigue, pero no impide simular ni exportar
+            diagnostics.append(_diag(
+                WARNING, "broken_edge", f"El edge {edge_id!r} conecta nodos que no existen y se ignora", edge_id=edge_id
+            ))
+            continue
+        if source == START_NODE and start is None:
+            start = target
+
+        handle = edge.get("sourceHandle")
+        if not handle:
+            defaults.setdefault(source, target)
+            continue
+        parsed = choice_handle(handle)
+        if parsed is None:
+            continue
+        capture_idx, option_idx = parsed
+        if option_idx >= captures.get(source, {}).get(capture_idx, 0):
+            # Edge de una opción borrada: no rompe el flujo, se ignora
+            diagnostics.append(_diag(
+                WARNING, "invalid_handle",
+                f"El edge {edge_id!r} sale de {handle!r}, que no existe en el nodo {source!r}",
+                node_id=source, edge_id=edge_id,
+            ))
+            continue
+        transitions.setdefault((source, capture_idx, option_idx), target)
+
+    if start is None:
+        diagnostics.append(_diag(ERROR, "missing_start", "El flujo no tiene conexión desde start-node"))
+
+    for node_id, opts in options.items():
+        if node_id in defaults:
+            continue
+        for capture_idx, option_idx, value in opts:
+            if (node_id, capture_idx, option_idx) not in transitions:
+                diagnostics.append(_diag(
+                    WARNING, "dangling_choice", f"La opción {value!r} del nodo {node_id!r} no lleva a ningún nodo",
+                    node_id=node_id,
+                ))
+
+    if any(d["level"] == ERROR for d in diagnostics):
+        return diagnostics, None
+
+    # Solo listas: los ids de nodo no siempre son claves válidas en Mongo
+    graph = {
+        "start": start,
+        "nodes": nodes,
+        "options": [[node_id, opts] for node_id, opts in options.items()],
+        "transitions": [[s, c, o, t] for (s, c, o), t in transitions.items()],
+        "defaults": [[s, t] for s, t in defaults.items()],
+        "intents": sorted({choice_intent(value) for opts in options.values() for _, _, value in opts}),
+    }
+    return diagnostics, graph
+
+
+def compile_graph(flow: dict) -> dict:
+    # Flujo suelto (nodes + metadata): grafo compilado o FlowInvalid
+    diagnostics, graph = check_flow(flow)
+    if graph is None:
+        raise FlowInvalid(diagnostics)
+    return graph
+
+
+def compile_content(doc: dict) -> Tuple[dict, List[dict]]:
+    diagnostics, graph = check_flow(doc)
+    return {"rev": COMPILE_REV, "version": doc.get("version", 0), "graph": graph}, diagnostics
+
+
+def is_current(doc: dict) -> bool:
+    compiled = doc.get(COMPILED_FIELD)
+    return (
+        isinstance(compiled, dict)
+        and compiled.get("rev") == COMPILE_REV
+        and compiled.get("version") == doc.get("version", 0)
+    )
+
+
+def graph_of(doc: dict) -> dict:
+    """Grafo de un documento ya compilado; FlowInvalid si el flujo tiene errores."""
+    graph = doc[COMPILED_FIELD].get("graph")
+    if graph is None:
+        raise FlowInvalid(doc.get(DIAGNOSTICS_FIELD) or [])
+    return graph
+
+
+async def compile_saved(doc: dict) -> List[dict]:
+    """Compila el documento recién guardado y lo persiste. Devuelve los diagnósticos."""
+    compiled, diagnostics = await run_in_threadpool(compile_content, doc)
+    doc[COMPILED_FIELD] = compiled
+    doc[DIAGNOSTICS_FIELD] = diagnostics
+    # Filtro por versión: una compilación que termina tarde no pisa la del guardado siguiente
+    await db.flows.update_one(
+        version_filter(doc["_id"], doc.get("version", 0)),
+        {"$set": {COMPILED_FIELD: compiled, DIAGNOSTICS_FIELD: diagnostics}},
+    )
+    return diagnostics
+
+
+async def ensure_compiled(docs: List[dict]) -> List[dict]:
+    """Completa la compilación de documentos leídos con HEAD; descarta los que ya no existen."""
+    stale = [d for d in docs if not is_current(d)]
+    if stale:
+        # Flujos anteriores a la compilación (o de otra COMPILE_REV): una sola consulta por el contenido
+        cur = db.flows.find(
+            {"_id": {"$in": [d["_id"] for d in stale]}},
+            {"nodes": 1, "metadata": 1, "version": 1, "snapshot": 1, snapshots.DETACHED: 1},
+        )
+        full = {d["_id"]: d for d in await snapshots.materialize_many([d async for d in cur])}
+        for doc in stale:
+            src = full.get(doc["_id"])
+            if src is None:
+                continue
+            await compile_saved(src)
+            doc.update({k: src.get(k) for k in ("version", COMPILED_FIELD, DIAGNOSTICS_FIELD)})
+    return [d for d in docs if is_current(d)]
+
+
+async def load(flow_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+    # Sin el diagrama salvo que haya que compilarlo
+    doc = await db.flows.find_one({"_id": flow_id}, {**HEAD, **(projection or {})})
+    if doc is None:
+        return None
+    found = await ensure_compiled([doc])
+    return found[0] if found else None
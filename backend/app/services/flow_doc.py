@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from app.schemas.flow import FlowDB
+from app.utils import format_mongo_document
+
+# Marca de documentos cuyos nodos se validaron con Node al escribirse.
+# Subirla si cambia el schema: los documentos viejos vuelven al camino validado.
+SCHEMA_REV = 1
+SCHEMA_REV_FIELD = "schema_rev"
+
+
+def _trusted(doc: dict) -> bool:
+    # Nodos confiables por la marca; los campos de primer nivel se revisan (es barato)
+    return (
+        doc.get(SCHEMA_REV_FIELD) == SCHEMA_REV
+        and isinstance(doc.get("name"), str)
+        and isinstance(doc.get("project_id"), str)
+        and isinstance(doc.get("nodes"), list)
+        and isinstance(doc.get("metadata", {}), dict)
+        and isinstance(doc.get("owner_id"), (str, type(None)))
+        and isinstance(doc.get("version", 0), int)
+        and all(isinstance(doc.get(k), (datetime, type(None))) for k in ("created_at", "updated_at"))
+    )
+
+
+def flow_payload(doc: dict) -> Dict[str, Any]:
+    """Documento de Mongo -> cuerpo de FlowDB, listo para serializar con orjson."""
+    if not _trusted(doc):
+        return FlowDB.model_validate(format_mongo_document(doc)).model_dump(mode="json")
+    # Mismas claves y orden que FlowDB, sin copiar ni revalidar los nodos
+    return {
+        "id": str(doc["_id"]),
+        "created_at": doc.get("created_at"),
+        "updated_at": doc.get("updated_at"),
+        "project_id": doc["project_id"],
+        "name": doc["name"],
+        "nodes": doc["nodes"],
+        "metadata": doc.get("metadata", {}),
+        "owner_id": doc.get("owner_id"),
+        "version": doc.get("version", 0),
+    }
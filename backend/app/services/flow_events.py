@@ -0,0 +1,45 @@
+"""Avisos de cambios de flujos dentro del proceso.
+
+Se publica desde invalidation: cambios de este worker y de los demás (change stream o
+polling). Los suscriptores (las simulaciones por WebSocket) reciben el id y si el
+flujo fue borrado. Corre en el
+event loop: los listeners deben ser baratos y no bloquear.
+"""
+from typing import Callable, Dict, Set
+
+from app.services import invalidation
+
+Listener = Callable[[str, bool], None]
+
+_listeners: Dict[str, Set[Listener]] = {}
+
+
+def subscribe(flow_id: str, listener: Listener) -> Callable[[], None]:
+    _listeners.setdefault(flow_id, set()).add(listener)
+
+    def unsubscribe() -> None:
+        listeners = _listeners.get(flow_id)
+        if listeners is not None:
+            listeners.discard(listener)
+            if not listeners:
+                del _listeners[flow_id]
+
+    return unsubscribe
+
+
+def publish(flow_id: str, deleted: bool = False) -> None:
+    for listener in list(_listeners.get(flow_id, ())):
+        listener(flow_id, deleted)
+
+
+def stats() -> dict:
+    return {"flows": len(_listeners), "listeners": sum(len(v) for v in _listeners.values())}
+
+
+def _publish_all() -> None:
+    # Pudieron perderse cambios (se cortó el change stream): que todos recarguen
+    for flow_id in list(_listeners):
+        publish(flow_id)
+
+
+invalidation.register("flows", publish, tracked=lambda: list(_listeners), reset=_publish_all)
@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from app.schemas.flow import FlowDB
+from app.services import flow_compile, invalidation
+from app.services.cache import LRUCache
+from app.services.db import flows_repo
+from app.settings import settings
+from starlette.concurrency import run_in_threadpool
+
+
+@dataclass
+class CompiledNode:
+    id: str
+    type: str
+    messages: List[str] = field(default_factory=list)
+    # [(capture_idx, option_idx, valor)] en el orden en que se muestran
+    options: List[Tuple[int, int, str]] = field(default_factory=list)
+
+
+@dataclass
+class CompiledFlow:
+    nodes: Dict[str, CompiledNode]
+    transitions: Dict[Tuple[str, int, int], str]
+    defaults: Dict[str, str]
+    start_target: Optional[str]
+    choices: Dict[str, List[dict]] = field(default_factory=dict)
+
+    def target(self, node_id: str, capture_idx: int, option_idx: int) -> Optional[str]:
+        tgt = self.transitions.get((node_id, capture_idx, option_idx))
+        if tgt is None:
+            tgt = self.defaults.get(node_id)
+        return tgt
+
+
+def from_graph(graph: dict) -> CompiledFlow:
+    """Forma compilada guardada en Mongo -> estructuras de simulación (sin revalidar nodos)."""
+    nodes = {
+        node_id: CompiledNode(id=node_id, type=node_type, messages=[value for _, value in messages])
+        for node_id, node_type, messages in graph["nodes"]
+    }
+    for node_id, opts in graph["options"]:
+        nodes[node_id].options = [tuple(o) for o in opts]
+
+    compiled = CompiledFlow(
+        nodes=nodes,
+        transitions={(s, c, o): t for s, c, o, t in graph["transitions"]},
+        defaults=dict(graph["defaults"]),
+        start_target=graph["start"],
+    )
+
+    # Choices ya resueltas por nodo: cada paso de simulación es O(choices)
+    for node in nodes.values():
+        if node.options:
+            compiled.choices[node.id] = [
+                {"id": compiled.target(node.id, c, o), "value": value}
+                for c, o, value in node.options
+            ]
+    return compiled
+
+
+def compile_flow(flow: FlowDB) -> CompiledFlow:
+    # FlowInvalid si el flujo tiene errores estructurales
+    return from_graph(flow_compile.compile_graph(flow.model_dump()))
+
+
+# flow_id -> (updated_at, CompiledFlow)
+_compiled_cache = LRUCache(maxsize=settings.FLOW_CACHE_SIZE)
+
+invalidation.register(
+    "flows",
+    lambda flow_id, deleted: _compiled_cache.pop(flow_id),
+    tracked=_compiled_cache.keys,
+    reset=_compiled_cache.clear,
+)
+
+
+def compiled_cache_stats() -> dict:
+    return _compiled_cache.stats()
+
+
+def get_compiled_flow(flow: FlowDB) -> CompiledFlow:
+    # Sin id no hay clave estable: se compila sin cachear
+    if not flow.id:
+        return compile_flow(flow)
+
+    entry = _compiled_cache.get(flow.id)
+    if entry is not None and entry[0] == flow.updated_at:
+        return entry[1]
+    compiled = compile_flow(flow)
+    # Con el change stream activo el cache se sirve sin validar: solo lo llena load_compiled_flow
+    if not invalidation.trusted():
+        _compiled_cache.set(flow.id, (flow.updated_at, compiled))
+    return compiled
+
+
+async def load_compiled_flow(flow_id: str) -> Optional[CompiledFlow]:
+    epoch = invalidation.epoch()
+    entry = _compiled_cache.get(flow_id)
+    if entry is not None and invalidation.trusted():
+        # Cualquier cambio ya lo habría descartado: ni siquiera se consulta la versión
+        return entry[1]
+    if entry is not None:
+        # Si la versión ya está en memoria se evita traer el documento
+        head = await flows_repo.get_flow_version(flow_id)
+        if not head:
+            return None
+        if head.get("updated_at") == entry[0]:
+            return entry[1]
+
+    # Forma compilada al guardar: no se traen ni validan los nodos
+    doc = await flow_compile.load(ObjectId(flow_id))
+    if not doc:
+        return None
+    compiled = await run_in_threadpool(from_graph, flow_compile.graph_of(doc))
+    # Si hubo una invalidación mientras se leía, lo leído puede ser anterior al cambio
+    if epoch == invalidation.epoch():
+        _compiled_cache.set(flow_id, (doc.get("updated_at"), compiled))
+    return compiled
@@ -0,0 +1,128 @@
+from typing import Any, Dict, List, Tuple
+
+from app.schemas.flow import FlowPatchOp, Node
+
+# Campo del documento donde vive cada colección editable
+FIELDS = {"node": "nodes", "edge": "metadata.edges"}
+
+
+# Relleno para validar cambios parciales de un nodo con el mismo modelo que las altas
+_NODE_BASE = {"id": "_", "type": "_", "position": {"x": 0, "y": 0}, "data": {}}
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _node_changes(value: dict) -> dict:
+    # Solo campos de Node y ya normalizados: el documento queda igual que si se validara al leer
+    fields = {k: v for k, v in value.items() if k in Node.model_fields and k != "id"}
+    full = Node(**{**_NODE_BASE, **fields}).model_dump()
+    return {k: full[k] for k in fields}
+
+
+def _plan(ops: List[FlowPatchOp]) -> Dict[str, Tuple[set, Dict[str, dict], Dict[str, dict]]]:
+    # Se aplican las ops en orden y se reducen a: ids a quitar, cambios por id y altas
+    plans = {target: (set(), {}, {}) for target in FIELDS}
+    for op in ops:
+        removes, updates, adds = plans[op.target]
+        item_id = op.value.get("id") if op.op == "add" else op.id
+        if not item_id:
+            raise PatchError(f"La operación {op.op} sobre {op.target} requiere un id")
+
+        if op.op == "add":
+            if item_id in adds:
+                raise PatchError(f"El pedido agrega dos veces el {op.target} {item_id}")
+            value = dict(op.value)
+            if op.target == "node":
+                value = Node(**value).model_dump()
+            adds[item_id] = value
+        elif op.op == "update":
+            if op.target == "node":
+                value = _node_changes(op.value)
+            else:
+                value = {k: v for k, v in op.value.items() if k != "id"}
+            if item_id in adds:
+                adds[item_id].update(value)
+            else:
+                updates.setdefault(item_id, {}).update(value)
+        else:
+            if adds.pop(item_id, None) is None:
+                removes.add(item_id)
+                updates.pop(item_id, None)
+    return plans
+
+
+def _array_expr(field: str, removes: set, updates: Dict[str, dict], adds: Dict[str, dict]) -> Any:
+    expr: Any = {"$ifNull": [f"${field}", []]}
+    if removes:
+        expr = {"$filter": {
+            "input": expr,
+            "as": "it",
+            "cond": {"$not": [{"$in": ["$$it.id", {"$literal": sorted(removes)}]}]},
+        }}
+    if updates:
+        ids = list(updates)
+        expr = {"$map": {
+            "input": expr,
+            "as": "it",
+            "in": {"$let": {
+                "vars": {"i": {"$indexOfArray": [{"$literal": ids}, "$$it.id"]}},
+                "in": {"$cond": [
+                    {"$eq": ["$$i", -1]},
+                    "$$it",
+                    {"$mergeObjects": ["$$it", {"$arrayElemAt": [{"$literal": [updates[i] for i in ids]}, "$$i"]}]},
+                ]},
+            }},
+        }}
+    if adds:
+        expr = {"$concatArrays": [expr, {"$literal": list(adds.values())}]}
+    return expr
+
+
+def build_patch_update(ops: List[FlowPatchOp], extra: Dict[str, Any]) -> Tuple[List[dict], Dict[str, List[str]]]:
+    """Update por pipeline: un solo viaje y atómico, sin reenviar el diagrama completo.
+
+    Devuelve también, por campo, los ids que se agregan sin quitarse antes: no pueden existir.
+    """
+    stage: Dict[str, Any] = {
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+    }
+    for key, value in extra.items():
+        stage[key] = {"$literal": value}
+    added: Dict[str, List[str]] = {}
+    for target, (removes, updates, adds) in _plan(ops).items():
+        if removes or updates or adds:
+            stage[FIELDS[target]] = _array_expr(FIELDS[target], removes, updates, adds)
+        # Quitar y volver a agregar el mismo id en un pedido es un reemplazo, no un duplicado
+        new_ids = sorted(set(adds) - removes)
+        if new_ids:
+            added[FIELDS[target]] = new_ids
+    return [{"$set": stage}], added
+
+
+def absent_filter(added: Dict[str, List[str]]) -> dict:
+    # Va en el filtro del update: un alta con id existente no matchea y no escribe nada
+    return {f"{field}.id": {"$nin": ids} for field, ids in added.items()}
+
+
+def existing_ids(doc: dict, added: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Ids de added que ya están en doc, por target (node / edge) como los manda el cliente."""
+    found = {}
+    targets = {field: target for target, field in FIELDS.items()}
+    for field, ids in added.items():
+        items = doc
+        for part in field.split("."):
+            items = (items or {}).get(part)
+        present = {item.get("id") for item in items or []}
+        dupes = [i for i in ids if i in present]
+        if dupes:
+            found[targets[field]] = dupes
+    return found
+
+
+def version_filter(flow_id, version: int) -> dict:
+    # Documentos anteriores al versionado cuentan como versión 0
+    if version == 0:
+        return {"_id": flow_id, "$or": [{"version": 0}, {"version": {"$exists": False}}]}
+    return {"_id": flow_id, "version": version}
@@ -0,0 +1,241 @@
+"""Invalidación de caches en memoria entre workers.
+
+Cada worker sigue los cambios de ``flows`` con un change stream y
+descarta las entradas afectadas de sus caches. Donde no hay change streams (mongod
+standalone, mongomock) consulta ``updated_at`` por lotes cada
+INVALIDATION_POLL_INTERVAL segundos, y revisa si los ids cacheados siguen existiendo
+(un borrado no deja ``updated_at``).
+
+Solo con el change stream activo (``trusted()``) los caches se sirven sin comparar la
+versión contra Mongo; con polling siguen validando y la invalidación solo los limpia
+y avisa a las simulaciones abiertas.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.services.cache import LRUCache
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Solo colecciones con algún cache registrado: un evento sin consumidor es trabajo perdido
+WATCHED = ("flows",)
+
+STOPPED = "stopped"
+CHANGE_STREAM = "change_stream"
+POLLING = "polling"
+
+RECENT_SIZE = 10_000
+# "The $changeStream stage is only supported on replica sets": no va a haber stream
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+# Las escrituras internas (compilación, snapshot) no tocan updated_at: no invalidan
+_PIPELINE = [{"$match": {
+    "ns.coll": {"$in": list(WATCHED)},
+    "$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"updateDescription.updatedFields.updated_at": {"$exists": True}},
+    ],
+}}]
+
+
+class _Registration:
+    def __init__(self, evict, tracked=None, reset=None):
+        self.evict: Callable[[str, bool], None] = evict
+        self.tracked: Optional[Callable[[], Iterable[str]]] = tracked
+        self.reset: Optional[Callable[[], None]] = reset
+
+
+_registry: Dict[str, List[_Registration]] = {}
+_mode = STOPPED
+_epoch = 0
+_task: Optional[asyncio.Task] = None
+_stats = {"events": 0, "restarts": 0}
+# (colección, id) -> último updated_at despachado: el eco de un cambio propio no invalida dos veces
+_recent = LRUCache(maxsize=RECENT_SIZE)
+
+
+def register(
+    collection: str,
+    evict: Callable[[str, bool], None],
+    tracked: Optional[Callable[[], Iterable[str]]] = None,
+    reset: Optional[Callable[[], None]] = None,
+) -> None:
+    """evict(id, borrado) por documento; tracked() ids cacheados (para detectar borrados);
+    reset() vacía todo cuando pudieron perderse eventos."""
+    _registry.setdefault(collection, []).append(_Registration(evict, tracked, reset))
+
+
+def trusted() -> bool:
+    return _mode == CHANGE_STREAM
+
+
+def epoch() -> int:
+    # Cambia con cada invalidación: quien leyó de Mongo antes no debe cachear lo leído
+    return _epoch
+
+
+def _millis(value: datetime) -> datetime:
+    # Mongo guarda milisegundos: así coincide lo escrito con lo que vuelve por stream o polling
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def changed(collection: str, doc_id: str, deleted: bool = False, updated_at: Optional[datetime] = None) -> None:
+    """Descarta lo cacheado de un documento: cambio propio o visto en otro worker."""
+    global _epoch
+    key = (collection, doc_id)
+    if deleted:
+        _recent.pop(key)
+    elif updated_at is not None:
+        updated_at = _millis(updated_at)
+        if _recent.get(key) == updated_at:
+            return
+        _recent.set(key, updated_at)
+    _epoch += 1
+    _stats["events"] += 1
+    for reg in _registry.get(collection, ()):
+        reg.evict(doc_id, deleted)
+
+
+def _set_mode(mode: str) -> None:
+    global _mode, _epoch
+    if mode == _mode:
+        return
+    _mode = mode
+    _epoch += 1
+    # Entre un modo y otro pudieron perderse cambios: se empieza de cero
+    for regs in _registry.values():
+        for reg in regs:
+            if reg.reset:
+                reg.reset()
+
+
+def stats() -> dict:
+    return {"mode": _mode, **_stats}
+
+
+# ---- Change stream ----
+class _Unavailable(Exception):
+    pass
+
+
+async def _watch(database: AsyncDatabase) -> None:
+    if not callable(getattr(type(database), "watch", None)):
+        # Reemplazos de Mongo para pruebas (mongomock_motor) sin change streams
+        raise _Unavailable(f"{type(database).__name__} no implementa watch")
+    try:
+        stream = await database.watch(_PIPELINE)
+    except OperationFailure as exc:
+        # Standalone (sin replica set); cualquier otro error se reintenta
+        if exc.code == CHANGE_STREAMS_UNSUPPORTED:
+            raise _Unavailable(exc) from exc
+        raise
+    except NotImplementedError as exc:
+        # mongomock
+        raise _Unavailable(exc) from exc
+    try:
+        async with stream:
+            _set_mode(CHANGE_STREAM)
+            logger.info("Invalidación de caches por change stream")
+            async for change in stream:
+                doc_id = (change.get("documentKey") or {}).get("_id")
+                if doc_id is None:
+                    continue
+                fields = (change.get("updateDescription") or {}).get("updatedFields") or change.get("fullDocument") or {}
+                changed(change["ns"]["coll"], str(doc_id), change["operationType"] == "delete", fields.get("updated_at"))
+    finally:
+        # Termine como termine (error, cancelación), sin stream los caches dejan de ser confiables
+        _set_mode(STOPPED)
+
+
+# ---- Polling ----
+async def _poll_updates(database: AsyncDatabase, collection: str, since: datetime) -> datetime:
+    # Solapamiento: los relojes de los workers no coinciden; lo ya despachado se omite en changed
+    floor = since - timedelta(seconds=settings.INVALIDATION_POLL_OVERLAP)
+    last: Optional[Tuple[datetime, object]] = None
+    newest = since
+    while True:
+        query = {"updated_at": {"$gt": floor}}
+        if last is not None:
+            query = {"$or": [{"updated_at": {"$gt": last[0]}}, {"updated_at": last[0], "_id": {"$gt": last[1]}}]}
+        cur = database[collection].find(query, {"updated_at": 1}).sort([("updated_at", 1), ("_id", 1)])
+        batch = await cur.to_list(length=settings.INVALIDATION_POLL_BATCH)
+        for doc in batch:
+            changed(collection, str(doc["_id"]), updated_at=doc["updated_at"])
+            newest = max(newest, doc["updated_at"])
+        if len(batch) < settings.INVALIDATION_POLL_BATCH:
+            break
+        last = (batch[-1]["updated_at"], batch[-1]["_id"])
+    return newest
+
+
+async def _poll_deleted(database: AsyncDatabase, collection: str) -> None:
+    ids = set()
+    for reg in _registry.get(collection, ()):
+        if reg.tracked:
+            ids.update(i for i in reg.tracked() if ObjectId.is_valid(i))
+    ids = list(ids)
+    for start in range(0, len(ids), settings.INVALIDATION_POLL_BATCH):
+        chunk = ids[start:start + settings.INVALIDATION_POLL_BATCH]
+        cur = database[collection].find({"_id": {"$in": [ObjectId(i) for i in chunk]}}, {"_id": 1})
+        alive = {str(d["_id"]) async for d in cur}
+        for doc_id in chunk:
+            if doc_id not in alive:
+                changed(collection, doc_id, deleted=True)
+
+
+async def _poll(database: AsyncDatabase) -> None:
+    _set_mode(POLLING)
+    logger.info("Invalidación de caches por polling cada %ss", settings.INVALIDATION_POLL_INTERVAL)
+    since = {name: datetime.utcnow() for name in WATCHED}
+    while True:
+        await asyncio.sleep(settings.INVALIDATION_POLL_INTERVAL)
+        for name in WATCHED:
+            try:
+                since[name] = await _poll_updates(database, name, since[name])
+                await _poll_deleted(database, name)
+            except PyMongoError as exc:
+                logger.warning("Polling de invalidación falló para %s: %s", name, exc)
+            except Exception:
+                logger.exception("Error inesperado en el polling de invalidación para %s", name)
+
+
+async def _run(database: AsyncDatabase) -> None:
+    while True:
+        try:
+            await _watch(database)
+        except _Unavailable as exc:
+            logger.info("Sin change streams (%s): se usa polling", exc.__cause__ or exc)
+            break
+        except PyMongoError as exc:
+            logger.warning("Change stream interrumpido: %s", exc)
+        except Exception:
+            # Un error inesperado no puede terminar la tarea: se reintenta igual
+            logger.exception("Error inesperado en el change stream de invalidación")
+        _stats["restarts"] += 1
+        await asyncio.sleep(settings.INVALIDATION_RETRY_SECONDS)
+    await _poll(database)
+
+
+def start(database: AsyncDatabase) -> None:
+    global _task
+    if _task is None and settings.INVALIDATION_ENABLED:
+        _task = asyncio.create_task(_run(database))
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    _set_mode(STOPPED)
@@ -0,0 +1,161 @@
+"""Simulación interactiva por WebSocket.
+
+El flujo se carga y compila una vez al conectar; el nodo actual vive en la conexión
+y cada respuesta del usuario es un paso en memoria (sin Mongo ni validación).
+
+Protocolo (JSON en frames de texto; los binarios se responden con un error):
+    cliente -> {"value": "<opción>"} | {"type": "restart", "node_id": "<opcional>"}
+    servidor -> {"type": "step", "node_id", "messages", "choices"}
+              | {"type": "reload", "deleted": bool}   el flujo cambió en otro request
+              | {"type": "error", "detail", ["diagnostics"]}
+"""
+import asyncio
+from typing import Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.services import flow_events, metrics
+from app.services.flow_compile import FlowInvalid
+from app.services.flow_graph import CompiledFlow, load_compiled_flow
+from app.services.sessions import SimulationSession
+from app.settings import settings
+
+# Códigos de cierre 4xxx: el equivalente HTTP + 4000
+CLOSE_INVALID_ID = 4400
+CLOSE_NOT_FOUND = 4404
+CLOSE_INVALID_FLOW = 4422
+CLOSE_TRY_AGAIN = 1013
+
+_open = 0
+
+
+class LiveSimulation:
+    def __init__(self, websocket: WebSocket, flow_id: str, flow: CompiledFlow, node_id: str):
+        self.websocket = websocket
+        self.flow_id = flow_id
+        self.start_node = node_id
+        self.session = SimulationSession(flow_id, flow, node_id)
+        # Se marca desde flow_events (cualquier worker); el flujo se recarga en el próximo mensaje del cliente
+        self.stale = False
+        self._notice: Optional[asyncio.Future] = None
+        self._lock = asyncio.Lock()
+
+    async def send(self, frame: dict) -> None:
+        # Respuestas y avisos salen de tareas distintas: un envío a la vez
+        async with self._lock:
+            await self.websocket.send_text(orjson.dumps(frame).decode())
+
+    def on_change(self, flow_id: str, deleted: bool) -> None:
+        # El mismo cambio llega local y por el change stream: un aviso por recarga
+        if self.stale and not deleted:
+            return
+        self.stale = True
+        # Sin esperar: publish corre dentro del request que guardó el flujo
+        self._notice = asyncio.ensure_future(self._notify(deleted))
+
+    async def _notify(self, deleted: bool) -> None:
+        try:
+            await self.send({"type": "reload", "deleted": deleted})
+        except (WebSocketDisconnect, RuntimeError):
+            # El cliente ya se fue: no hay a quién avisar
+            pass
+
+    async def reload(self) -> bool:
+        self.stale = False
+        try:
+            flow = await load_compiled_flow(self.flow_id)
+        except FlowInvalid as exc:
+            # Se sigue simulando la última versión válida
+            await self.send({"type": "error", "detail": str(exc), "diagnostics": exc.diagnostics})
+            return True
+        if flow is None:
+            await self.websocket.close(code=CLOSE_NOT_FOUND, reason="Flujo no encontrado")
+            return False
+        self.session.flow = flow
+        if self.session.node_id not in flow.nodes:
+            self.session.node_id = self.start_node
+        return True
+
+    def step(self, message) -> dict:
+        if not isinstance(message, dict):
+            return {"type": "error", "detail": "Mensaje inválido"}
+        if message.get("type") == "restart":
+            self.session.node_id = message.get("node_id") or self.start_node
+            value = None
+        else:
+            value = message.get("value")
+            if not isinstance(value, str):
+                return {"type": "error", "detail": "Falta 'value'"}
+        try:
+            return {"type": "step", **self.session.step(value)}
+        except HTTPException as exc:
+            return {"type": "error", "detail": exc.detail}
+
+    async def run(self) -> None:
+        await self.send({"type": "step", **self.session.step(None)})
+        while True:
+            try:
+                frame = await asyncio.wait_for(
+                    self.websocket.receive(), timeout=settings.SIMULATION_WS_IDLE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                await self.websocket.close(code=1000, reason="Sin actividad")
+                return
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+            if self.stale and not await self.reload():
+                return
+            # receive_text() falla con un frame binario (y cierra con 1011): se responde como inválido
+            raw = frame.get("text")
+            try:
+                message = orjson.loads(raw) if raw is not None else None
+            except orjson.JSONDecodeError:
+                message = None
+            await self.send(self.step(message))
+
+
+async def _load(websocket: WebSocket, flow_id: str) -> Optional[CompiledFlow]:
+    try:
+        flow = await load_compiled_flow(flow_id)
+    except FlowInvalid as exc:
+        await websocket.send_text(orjson.dumps(
+            {"type": "error", "detail": str(exc), "diagnostics": exc.diagnostics}
+        ).decode())
+        await websocket.close(code=CLOSE_INVALID_FLOW, reason="Flujo con errores")
+        return None
+    if flow is None:
+        await websocket.close(code=CLOSE_NOT_FOUND, reason="Flujo no encontrado")
+    return flow
+
+
+async def serve(websocket: WebSocket, flow_id: str, node_id: str) -> None:
+    global _open
+    # Se acepta antes de rechazar: así el cliente recibe el código y el motivo
+    await websocket.accept()
+    if not ObjectId.is_valid(flow_id):
+        await websocket.close(code=CLOSE_INVALID_ID, reason="ID inválido")
+        return
+    if _open >= settings.SIMULATION_WS_MAX:
+        await websocket.close(code=CLOSE_TRY_AGAIN, reason="Demasiadas simulaciones abiertas")
+        return
+
+    _open += 1
+    metrics.simulation_sockets.inc()
+    unsubscribe = None
+    try:
+        flow = await _load(websocket, flow_id)
+        if flow is None:
+            return
+        live = LiveSimulation(websocket, flow_id, flow, node_id)
+        unsubscribe = flow_events.subscribe(flow_id, live.on_change)
+        await live.run()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if unsubscribe:
+            unsubscribe()
+        _open -= 1
+        metrics.simulation_sockets.dec()
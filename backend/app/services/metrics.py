@@ -0,0 +1,172 @@
+"""Métricas en memoria con exposición en formato de texto de Prometheus.
+
+Sin dependencias: contadores, gauges e histogramas con etiquetas, protegidos por un
+lock. Registrar una observación cuesta un bisect y un par de sumas.
+"""
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, *labels, value: float) -> None:
+        # Para totales que ya lleva otra fuente (p. ej. contadores de un cache)
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # etiquetas -> [conteo por bucket (no acumulado)..., +Inf, suma]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, *labels, value: float) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            row[idx] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(row[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+_collectors: List[Callable[[], None]] = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def collector(fn: Callable[[], None]) -> Callable[[], None]:
+    """Función que actualiza gauges justo antes de cada scrape (valores caros o externos)."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    for fn in _collectors:
+        fn()
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- HTTP ----
+http_requests = _register(Counter(
+    "http_requests_total", "Requests HTTP por ruta, método y estado", ("method", "route", "status")))
+http_latency = _register(Histogram(
+    "http_request_duration_seconds", "Latencia de requests HTTP por ruta", ("method", "route")))
+http_in_flight = _register(Gauge(
+    "http_requests_in_flight", "Requests HTTP en curso"))
+
+simulation_sockets = _register(Gauge(
+    "simulation_websockets_open", "Simulaciones por WebSocket abiertas"))
+
+# ---- Threadpool (anyio) y bcrypt ----
+threadpool_busy = _register(Gauge(
+    "threadpool_busy_threads", "Hilos ocupados del threadpool de la app", ("pool",)))
+threadpool_capacity = _register(Gauge(
+    "threadpool_capacity_threads", "Capacidad del threadpool de la app", ("pool",)))
+
+# ---- Mongo ----
+mongo_latency = _register(Histogram(
+    "mongo_command_duration_seconds", "Duración de comandos Mongo por colección y operación",
+    ("collection", "command"), buckets=DB_BUCKETS))
+mongo_failures = _register(Counter(
+    "mongo_command_failures_total", "Comandos Mongo fallidos", ("collection", "command")))
+mongo_slow = _register(Counter(
+    "mongo_slow_commands_total", "Comandos Mongo que superaron MONGO_SLOW_QUERY_MS", ("collection", "command")))
+
+# ---- Caches ----
+cache_requests = _register(Counter(
+    "cache_requests_total", "Lecturas de cache por resultado (hit / miss)", ("cache", "result")))
+cache_size = _register(Gauge(
+    "cache_entries", "Entradas actuales por cache", ("cache",)))
+
+
+def observe_caches(caches: Dict[str, Optional[dict]]) -> None:
+    for name, stats in caches.items():
+        if not stats:
+            continue
+        cache_requests.set(name, "hit", value=stats["hits"])
+        cache_requests.set(name, "miss", value=stats["misses"])
+        cache_size.set(name, value=stats["size"])
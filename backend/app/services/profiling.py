@@ -0,0 +1,171 @@
+"""Perfilado opcional por request (muestreo de pilas de todos los hilos).
+
+Se muestrea en lugar de usar cProfile porque el trabajo pesado (generar el proyecto
+Rasa, comprimir el zip, analizar el flujo) corre en el threadpool, no en el event loop.
+Con concurrencia, otras requests en curso también aparecen en las muestras.
+"""
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from app.services.cache import TTLCache
+from app.settings import settings
+
+Frame = Tuple[str, int, str]  # (archivo, primera línea, función)
+
+# Hilos esperando trabajo o E/S: no cuentan como muestras útiles
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("_thread.py", "run"),
+}
+
+_profiles = TTLCache(maxsize=settings.PROFILING_STORE_MAX, ttl=settings.PROFILING_STORE_TTL)
+# Tiempo en Mongo de la request perfilada (lo suma CommandMonitor)
+_mongo_time: ContextVar[Optional[List[float]]] = ContextVar("profiling_mongo_time", default=None)
+
+_BASE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _short(filename: str) -> str:
+    if filename.startswith(_BASE):
+        return os.path.relpath(filename, _BASE)
+    marker = "site-packages" + os.sep
+    idx = filename.find(marker)
+    if idx >= 0:
+        return filename[idx + len(marker):]
+    return os.path.basename(filename)
+
+
+def _label(frame: Frame) -> str:
+    return f"{frame[2]} ({_short(frame[0])}:{frame[1]})"
+
+
+def record_mongo(seconds: float) -> None:
+    acc = _mongo_time.get()
+    if acc is not None:
+        acc[0] += seconds
+
+
+class Sampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class Profile:
+    """Una request perfilada: muestreo + tiempos de reloj, CPU y Mongo."""
+
+    def __init__(self, method: str, path: str):
+        self.id = secrets.token_urlsafe(9)
+        self.method = method
+        self.path = path
+        self._mongo = [0.0]
+        self._token = _mongo_time.set(self._mongo)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self.sampler = Sampler(settings.PROFILING_INTERVAL_MS / 1000).start()
+        self.wall_ms = self.cpu_ms = 0.0
+
+    def snapshot(self) -> None:
+        self.wall_ms = (time.perf_counter() - self._wall) * 1000
+        self.cpu_ms = (time.process_time() - self._cpu) * 1000
+
+    @property
+    def mongo_ms(self) -> float:
+        return self._mongo[0] * 1000
+
+    def finish(self) -> None:
+        self.sampler.stop()
+        self.snapshot()
+        _mongo_time.reset(self._token)
+        _profiles.set(self.id, self)
+
+    def top(self, n: int = 10) -> List[dict]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.sampler.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+        samples = max(1, sum(self.sampler.stacks.values()))
+        return [
+            {
+                "function": _label(frame),
+                "self_pct": round(100 * count / samples, 1),
+                "total_pct": round(100 * total[frame] / samples, 1),
+            }
+            for frame, count in own.most_common(n)
+        ]
+
+    def summary(self, n: int = 10) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "wall_ms": round(self.wall_ms, 2),
+            "cpu_ms": round(self.cpu_ms, 2),
+            "mongo_ms": round(self.mongo_ms, 2),
+            "samples": sum(self.sampler.stacks.values()),
+            "top": self.top(n),
+        }
+
+    def folded(self) -> str:
+        # Formato "pila;plegada conteo" (flamegraph.pl, speedscope)
+        return "\n".join(
+            ";".join(_label(f) for f in stack) + f" {count}"
+            for stack, count in self.sampler.stacks.most_common()
+        ) + "\n"
+
+    def server_timing(self) -> str:
+        return f"total;dur={self.wall_ms:.1f}, cpu;dur={self.cpu_ms:.1f}, mongo;dur={self.mongo_ms:.1f}"
+
+    def top_header(self, n: int = 5) -> str:
+        return "; ".join(f"{t['function']} {t['self_pct']}%" for t in self.top(n))
+
+
+def get_profile(profile_id: str) -> Optional[Profile]:
+    return _profiles.get(profile_id)
+
+
+def list_profiles() -> List[Dict]:
+    return [
+        {"id": p.id, "method": p.method, "path": p.path, "wall_ms": round(p.wall_ms, 2)}
+        for p in (_profiles.get(k) for k in _profiles.keys())
+        if p is not None
+    ]
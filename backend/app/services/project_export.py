@@ -0,0 +1,78 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+
+from app.services import export_cache
+from app.services.flow_compile import ERROR, FlowInvalid, graph_of
+from app.services.rasa import rasa_project_files
+from app.services.zipper import stream_zip
+from app.settings import settings
+
+_UNSAFE = re.compile(r"[^\w\-]+")
+
+# Pool propio: el de export_jobs (EXPORT_WORKERS) está dimensionado para exports sueltos
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    # El stream corre en hilos del threadpool: dos exports no deben crear dos pools
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.PROJECT_EXPORT_WORKERS or os.cpu_count() or 1)
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _folder(flow: dict) -> str:
+    # Nombre legible + sufijo del id para que dos flujos homónimos no choquen
+    name = _UNSAFE.sub("_", flow.get("name") or "flujo").strip("_") or "flujo"
+    return f"{name}-{flow['id'][-6:]}"
+
+
+def build_flow_files(graph: dict) -> List[Tuple[str, bytes]]:
+    # Corre en el pool de procesos: solo recibe el grafo compilado
+    return list(rasa_project_files(graph))
+
+
+def stream_project_export(flows: List[dict]) -> Iterator[bytes]:
+    # Se encolan todos los flujos antes de escribir el primero: con N workers el total ronda
+    # flujos / N veces el flujo promedio (PROJECT_EXPORT_WORKERS, por defecto un proceso por CPU)
+    pool = get_pool()
+    pending = []
+    for flow in flows:
+        try:
+            graph = graph_of(flow)
+        except FlowInvalid as exc:
+            # Un flujo con errores no frena el resto: se informan sus diagnósticos
+            errors = [d["message"] for d in exc.diagnostics if d["level"] == ERROR]
+            pending.append((_folder(flow), None, [("ERROR.txt", "\n".join(errors).encode())], None))
+            continue
+        key = export_cache.content_hash(graph)
+        files = export_cache.lookup_files(key)
+        future = pool.submit(build_flow_files, graph) if files is None else None
+        pending.append((_folder(flow), key, files, future))
+
+    def entries():
+        for folder, key, files, future in pending:
+            if files is None:
+                try:
+                    files = future.result()
+                except Exception as exc:
+                    yield f"{folder}/ERROR.txt", (str(exc) or type(exc).__name__).encode()
+                    continue
+                export_cache.store_files(key, files)
+            for path, data in files:
+                yield f"{folder}/{path}", data
+
+    yield from stream_zip(entries())
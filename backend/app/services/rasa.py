@@ -1,60 +1,78 @@
-from app.services.zipper import make_zip
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+from app.services.flow_compile import choice_intent
+from app.services.zipper import make_zip, stream_zip
 import json
-import textwrap
+import re
+from json.encoder import encode_basestring
 
-# --------------------------------------------------------
-# RASA GENERATOR (MENU FLOW - FSM)
-# --------------------------------------------------------
-def generate_rasa_project(flow: dict) -> bytes:
-    nodes = {n["id"]: n for n in flow["nodes"]}
-    edges = flow["metadata"]["edges"]
-
-    # --------------------------------------------------------
-    # DETECT START NODE
-    # --------------------------------------------------------
-    start_edge = next(e for e in edges if e["source"] == "start-node")
-    first_node_id = start_edge["target"]
-
-    # --------------------------------------------------------
-    # BUILD CHOICES MAP
-    # --------------------------------------------------------
-    choices_map = {}
-    for node in flow["nodes"]:
-        if node["type"] != "ActionNode":
-            continue
+# Subir al cambiar la salida del generador: invalida los exports cacheados
+GENERATOR_VERSION = 5
 
-        node_id = node["id"]
-        choices = []
+_PLAIN_SCALAR = re.compile(r"^[\w][\w\-.]*$")
 
-        for a in node["data"]["actions"]:
-            if a["type"] == "capture-info" and a["subtype"] == "choice":
-                choices.extend(a["value"]["choices"])
 
-        if choices:
-            choices_map[node_id] = choices
+def _q(text) -> str:
+    # Escalar YAML entre comillas dobles (JSON es un subconjunto válido de YAML)
+    return encode_basestring(str(text))
 
-    # --------------------------------------------------------
-    # BUILD TRANSITIONS (FSM)
-    # --------------------------------------------------------
-    transitions = {}
 
-    for e in edges:
-        src = e["source"]
-        tgt = e["target"]
-        handle = e.get("sourceHandle", "")
+def _plain(text: str) -> str:
+    # Identificadores simples van tal cual; cualquier otro valor se escapa
+    return text if _PLAIN_SCALAR.match(text) else _q(text)
 
-        if src not in choices_map:
+
+# --------------------------------------------------------
+# REPRESENTACIÓN INTERMEDIA (UNA PASADA SOBRE NODOS Y EDGES)
+# --------------------------------------------------------
+@dataclass
+class RasaIR:
+    first_node_id: str
+    intents: List[str] = field(default_factory=list)
+    # utter_key -> [(texto, [(título, payload)])]
+    utterances: Dict[str, List[Tuple[str, List[Tuple[str, str]]]]] = field(default_factory=dict)
+    # nodo actual -> intent -> nodo destino (búsqueda O(1) en el action server)
+    routes: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    end_nodes: List[str] = field(default_factory=list)
+
+
+def build_ir(graph: dict) -> RasaIR:
+    # graph: forma compilada al guardar (ver flow_compile); ya validada
+    options = dict(graph["options"])
+    utterances = {}
+    # Cualquier EndNode cierra la conversación (antes solo el id literal "end-node";
+    # llegar a otro EndNode mostraba utter_node_<id> y dejaba current_node apuntándolo)
+    end_nodes = {"end-node"}
+
+    for node_id, node_type, messages in graph["nodes"]:
+        if node_type == "EndNode":
+            end_nodes.add(node_id)
+        if node_type != "ActionNode":
             continue
+        buttons = [(value, f"/{choice_intent(value)}") for _, _, value in options.get(node_id, ())]
+        utterances[f"utter_node_{node_id}"] = [
+            (value, buttons) for subtype, value in messages if subtype == "text"
+        ]
+
+    # Si dos opciones del mismo nodo comparten intent gana la primera conectada
+    labels = {(node_id, c, o): value for node_id, opts in graph["options"] for c, o, value in opts}
+    routes: Dict[str, Dict[str, str]] = {}
+    for src, c, o, tgt in graph["transitions"]:
+        routes.setdefault(src, {}).setdefault(choice_intent(labels[(src, c, o)]), tgt)
+
+    return RasaIR(
+        first_node_id=graph["start"],
+        intents=list(graph["intents"]),
+        utterances=utterances,
+        routes=routes,
+        end_nodes=sorted(end_nodes),
+    )
 
-        if "choice" in handle:
-            idx = int(handle.split("-")[-1])
-            label = choices_map[src][idx]
-            transitions[f"{src}|{label}"] = tgt
 
-    # --------------------------------------------------------
-    # CONFIG.YML (SIN FALLBACK)
-    # --------------------------------------------------------
-    config_yml = """version: "3.1"
+# --------------------------------------------------------
+# EMISORES (CADA ARCHIVO SE ARMA CON LISTAS + JOIN)
+# --------------------------------------------------------
+CONFIG_YML = """version: "3.1"
 language: es
 
 pipeline:
@@ -68,50 +86,11 @@ policies:
   - name: RulePolicy
 """
 
-    # --------------------------------------------------------
-    # DOMAIN.YML
-    # --------------------------------------------------------
-    intents = set()
-    utterances = {}
-
-    for node_id, choices in choices_map.items():
-        for c in choices:
-            intents.add(f"choice_{c.lower().replace(' ', '_')}")
-
-    for node in flow["nodes"]:
-        if node["type"] != "ActionNode":
-            continue
-
-        node_id = node["id"]
-        utter_key = f"utter_node_{node_id}"
-        utterances[utter_key] = []
 
-        texts = []
-        buttons = []
-
-        for a in node["data"]["actions"]:
-            if a["type"] == "message" and a["subtype"] == "text":
-                texts.append(a["value"])
-
-            if a["type"] == "capture-info" and a["subtype"] == "choice":
-                for c in a["value"]["choices"]:
-                    intent = f"choice_{c.lower().replace(' ', '_')}"
-                    buttons.append({
-                        "title": c,
-                        "payload": f"/{intent}",
-                    })
-
-        for t in texts:
-            msg = {"text": t}
-            if buttons:
-                msg["buttons"] = buttons
-            utterances[utter_key].append(msg)
-
-    domain_yml = "version: '3.1'\n\nintents:\n"
-    for i in sorted(intents):
-        domain_yml += f"  - {i}\n"
-
-    domain_yml += """
+def emit_domain(ir: RasaIR) -> str:
+    out = ["version: '3.1'\n\nintents:\n"]
+    out.extend(f"  - {_plain(i)}\n" for i in ir.intents)
+    out.append("""
 slots:
   current_node:
     type: text
@@ -119,65 +98,72 @@ slots:
       - type: custom
 
 responses:
-"""
-
-    for k, msgs in utterances.items():
-        domain_yml += f"  {k}:\n"
-        for m in msgs:
-            domain_yml += f'    - text: "{m["text"]}"\n'
-            if "buttons" in m:
-                domain_yml += "      buttons:\n"
-                for b in m["buttons"]:
-                    domain_yml += f'        - title: "{b["title"]}"\n'
-                    domain_yml += f'          payload: "{b["payload"]}"\n'
-
-    domain_yml += """
+""")
+
+    for key, msgs in ir.utterances.items():
+        out.append(f"  {_plain(key)}:\n")
+        # Todos los textos de un nodo comparten botones: se renderizan una vez
+        block = None
+        for text, buttons in msgs:
+            out.append(f"    - text: {_q(text)}\n")
+            if buttons:
+                if block is None:
+                    block = "      buttons:\n" + "".join(
+                        f"        - title: {_q(title)}\n          payload: {_q(payload)}\n"
+                        for title, payload in buttons
+                    )
+                out.append(block)
+
+    out.append("""
   utter_end:
     - text: "Flujo finalizado."
 
 actions:
   - action_session_start
   - action_route_flow
-"""
+""")
+    return "".join(out)
+
 
-    # --------------------------------------------------------
-    # NLU.YML (MÍNIMO – SOLO SOPORTE MANUAL)
-    # --------------------------------------------------------
-    nlu_yml = "version: '3.1'\nnlu:\n"
-    for i in intents:
-        label = i.replace("choice_", "")
-        nlu_yml += f"""
-- intent: {i}
+def emit_nlu(ir: RasaIR) -> str:
+    out = ["version: '3.1'\nnlu:\n"]
+    for i in ir.intents:
+        # Bloque literal: un salto de línea en la etiqueta rompería el ejemplo
+        label = " ".join(i.replace("choice_", "").splitlines())
+        out.append(f"""
+- intent: {_plain(i)}
   examples: |
     - {label}
-"""
+""")
+    return "".join(out)
+
 
-    # --------------------------------------------------------
-    # RULES.YML (FSM PURO)
-    # --------------------------------------------------------
-    rules_yml = "version: '3.1'\nrules:\n\n"
-    rules_yml += """
+def emit_rules(ir: RasaIR) -> str:
+    out = ["version: '3.1'\nrules:\n\n", """
 - rule: start flow
   steps:
     - action: action_session_start
-"""
-
-    for i in sorted(intents):
-        rules_yml += f"""
-- rule: route {i}
+"""]
+    for i in ir.intents:
+        out.append(f"""
+- rule: {f"route {i}" if _PLAIN_SCALAR.match(i) else _q(f"route {i}")}
   steps:
-    - intent: {i}
+    - intent: {_plain(i)}
     - action: action_route_flow
-"""
+""")
+    return "".join(out)
 
-    # --------------------------------------------------------
-    # ACTIONS.PY (FSM DETERMINISTA)
-    # --------------------------------------------------------
-    actions_py = textwrap.dedent(f"""
-from rasa_sdk import Action
+
+def emit_actions(ir: RasaIR) -> str:
+    first_utter = json.dumps(f"utter_node_{ir.first_node_id}")
+    first_node = json.dumps(ir.first_node_id)
+    return f"""from rasa_sdk import Action
 from rasa_sdk.events import SessionStarted, SlotSet, ActionExecuted
 
-TRANSITIONS = {json.dumps(transitions, indent=2)}
+# nodo actual -> intent -> nodo destino
+ROUTES = {json.dumps(ir.routes, indent=2, ensure_ascii=False)}
+
+END_NODES = frozenset({json.dumps(ir.end_nodes, ensure_ascii=False)})
 
 class ActionSessionStart(Action):
     def name(self):
@@ -187,8 +173,8 @@ class ActionSessionStart(Action):
         events = []
         events.append(SessionStarted())
 
-        dispatcher.utter_message(response="utter_node_{first_node_id}")
-        events.append(SlotSet("current_node", "{first_node_id}"))
+        dispatcher.utter_message(response={first_utter})
+        events.append(SlotSet("current_node", {first_node}))
         events.append(ActionExecuted("action_listen"))
 
         return events
@@ -202,34 +188,90 @@ class ActionRouteFlow(Action):
         current = tracker.get_slot("current_node")
         intent = tracker.latest_message.get("intent", {{}}).get("name")
 
-        for key, tgt in TRANSITIONS.items():
-            src, label = key.split("|")
-            expected_intent = "choice_" + label.lower().replace(" ", "_")
-
-            if src == current and intent == expected_intent:
-                if tgt == "end-node":
-                    dispatcher.utter_message(response="utter_end")
-                    return [SlotSet("current_node", None)]
-
-                dispatcher.utter_message(response=f"utter_node_{{tgt}}")
-                return [SlotSet("current_node", tgt)]
-
-        dispatcher.utter_message(response=f"utter_node_{{current}}")
-        return []
-    """).strip()
-
-    # --------------------------------------------------------
-    # PACKAGE FILES
-    # --------------------------------------------------------
-    files = {
-        "project/config.yml": config_yml.encode(),
-        "project/domain.yml": domain_yml.encode(),
-        "project/data/nlu.yml": nlu_yml.encode(),
-        "project/data/rules.yml": rules_yml.encode(),
-        "project/actions/actions.py": actions_py.encode(),
-        "project/actions/__init__.py": b"",
-        "project/endpoints.yml": b"action_endpoint:\n  url: http://localhost:5055/webhook",
-        "project/models/.gitkeep": b"",
-    }
-
-    return make_zip(files)
+        tgt = ROUTES.get(current, {{}}).get(intent)
+        if tgt is None:
+            dispatcher.utter_message(response=f"utter_node_{{current}}")
+            return []
+
+        if tgt in END_NODES:
+            dispatcher.utter_message(response="utter_end")
+            return [SlotSet("current_node", None)]
+
+        dispatcher.utter_message(response=f"utter_node_{{tgt}}")
+        return [SlotSet("current_node", tgt)]"""
+
+
+# Se incluye en el proyecto exportado: mide el costo de rutear un mensaje
+BENCH_ROUTING_PY = '''"""Costo por mensaje de ActionRouteFlow.
+
+Uso (desde la carpeta del proyecto):  python bench_routing.py [iteraciones]
+"""
+import sys
+import time
+
+from actions.actions import END_NODES, ROUTES, ActionRouteFlow
+
+
+class _Dispatcher:
+    def utter_message(self, **kwargs):
+        pass
+
+
+class _Tracker:
+    def __init__(self, node, intent):
+        self.latest_message = {"intent": {"name": intent}}
+        self._node = node
+
+    def get_slot(self, name):
+        return self._node
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    samples = [(src, intent) for src, by_intent in ROUTES.items() for intent in by_intent]
+    if not samples:
+        print("El flujo no tiene transiciones.")
+        return
+
+    action = ActionRouteFlow()
+    dispatcher = _Dispatcher()
+    trackers = [_Tracker(src, intent) for src, intent in samples]
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        action.run(dispatcher, trackers[i % len(trackers)], None)
+    elapsed = time.perf_counter() - start
+
+    print(f"nodos con rutas: {len(ROUTES)}  transiciones: {len(samples)}  nodos finales: {len(END_NODES)}")
+    print(f"{iterations} mensajes en {elapsed * 1000:.1f} ms -> {elapsed / iterations * 1e6:.2f} µs/mensaje")
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+
+# --------------------------------------------------------
+# RASA GENERATOR (MENU FLOW - FSM)
+# --------------------------------------------------------
+def rasa_project_files(graph: dict) -> Iterator[Tuple[str, bytes]]:
+    # Los archivos salen de a uno para que el zip se pueda ir comprimiendo
+    ir = build_ir(graph)
+    yield "project/config.yml", CONFIG_YML.encode()
+    yield "project/domain.yml", emit_domain(ir).encode()
+    yield "project/data/nlu.yml", emit_nlu(ir).encode()
+    yield "project/data/rules.yml", emit_rules(ir).encode()
+    yield "project/actions/actions.py", emit_actions(ir).encode()
+    yield "project/actions/__init__.py", b""
+    yield "project/bench_routing.py", BENCH_ROUTING_PY.encode()
+    yield "project/endpoints.yml", b"action_endpoint:\n  url: http://localhost:5055/webhook"
+    yield "project/models/.gitkeep", b""
+
+
+def generate_rasa_project(graph: dict) -> bytes:
+    return make_zip(dict(rasa_project_files(graph)))
+
+
+def stream_rasa_project(graph: dict) -> Iterator[bytes]:
+    # Generador: nada se calcula hasta que el consumidor pide el primer trozo
+    yield from stream_zip(rasa_project_files(graph))
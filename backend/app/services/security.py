@@ -1,12 +1,34 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from typing import Optional
+from typing import Optional, Tuple
 import os
 
+from app.settings import settings
+
 ALGO = os.getenv("JWT_ALGORITHM", "HS256")
 SECRET = os.getenv("JWT_SECRET", "supersecreto")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes con otro costo quedan marcados para actualizarse en el próximo login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.AUTH_BCRYPT_ROUNDS)
+
+# bcrypt corre en su propio pool: una ola de logins no ocupa el threadpool de FastAPI
+_hash_pool = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+# Cupo de admisión: en ejecución + en cola. Lo que excede se rechaza de inmediato
+_hash_capacity = settings.AUTH_HASH_WORKERS + settings.AUTH_HASH_QUEUE
+# Hashes admitidos y sin terminar; solo se toca desde el event loop
+_hash_in_flight = 0
+
+
+def hashing_load() -> Tuple[int, int]:
+    # (en uso, cupo total) del pool de bcrypt, para /metrics
+    return _hash_in_flight, _hash_capacity
+
+
+class HashingBusy(Exception):
+    pass
+
 
 def hash_password(pw: str) -> str:
     return pwd_context.hash(pw)
@@ -14,6 +36,21 @@ def hash_password(pw: str) -> str:
 def verify_password(pw: str, hashed: str) -> bool:
     return pwd_context.verify(pw, hashed)
 
+def verify_and_update(pw: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    # (válida, nuevo hash si el costo configurado cambió)
+    return pwd_context.verify_and_update(pw, hashed)
+
+
+async def run_hashing(fn, *args):
+    global _hash_in_flight
+    if _hash_in_flight >= _hash_capacity:
+        raise HashingBusy()
+    _hash_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_in_flight -= 1
+
 def create_access_token(sub: str, extra_data: Optional[dict], expires_minutes: int = 60) -> str:
     exp = datetime.utcnow() + timedelta(minutes=expires_minutes)
     to_encode = {"sub": sub, "exp": exp, **extra_data}
@@ -0,0 +1,51 @@
+import secrets
+import time
+from typing import Optional
+
+from app.services.cache import TTLCache
+from app.services.flow_graph import CompiledFlow
+from app.services.simulate import simulate_flow
+from app.settings import settings
+
+
+class SimulationSession:
+    def __init__(self, flow_id: str, flow: CompiledFlow, node_id: str, session_id: Optional[str] = None):
+        self.id = session_id or secrets.token_urlsafe(16)
+        self.flow_id = flow_id
+        self.flow = flow
+        self.node_id = node_id
+
+    def step(self, value: Optional[str]) -> dict:
+        response = simulate_flow(self.node_id, value, self.flow)
+        self.node_id = response["node_id"]
+        return response
+
+
+# Sesiones en memoria; expiran tras SIMULATION_SESSION_TTL segundos sin actividad
+_sessions = TTLCache(
+    maxsize=settings.SIMULATION_SESSION_MAX,
+    ttl=settings.SIMULATION_SESSION_TTL,
+    sliding=True,
+)
+# Una sesión vencida retiene su flujo compilado hasta que alguien la lee: se barren cada tanto
+PURGE_INTERVAL = 60
+_last_purge = 0.0
+
+
+def create_session(flow_id: str, flow: CompiledFlow, node_id: str) -> SimulationSession:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= PURGE_INTERVAL:
+        _last_purge = now
+        _sessions.purge()
+    session = SimulationSession(flow_id, flow, node_id)
+    _sessions.set(session.id, session)
+    return session
+
+
+def get_session(session_id: str) -> Optional[SimulationSession]:
+    return _sessions.get(session_id)
+
+
+def end_session(session_id: str) -> bool:
+    return _sessions.pop(session_id) is not None
@@ -1,62 +1,113 @@
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import List, Optional, Union
 from app.schemas.flow import FlowDB
+from app.services.flow_graph import CompiledFlow, get_compiled_flow
+from app.settings import settings
 from fastapi import HTTPException
 
-def simulate_flow(node_id: str, value: str, flow: FlowDB):
-    nodes = {n.id: n for n in flow.nodes}
-    edges = flow.metadata.get("edges")
-    
-    current_node = nodes.get(node_id)
-
-    if not current_node:
-        raise HTTPException(status_code=404, detail="Nodo no encontrado")
-
-    # Si es EndNode, devolver mensaje de finalización
-    if current_node.type == "EndNode":
-        return {"messages": ["El flujo ha finalizado."], "choices": [], "node_id": node_id}
-    
-    if current_node.type == "StartNode":
-        target = next(e.get("target") for e in edges if e.get("source") == "start-node")
-        current_node = nodes.get(target)
-        node_id = target
-
-    # Preparar respuesta
-    response = {"messages": [], "choices": [], "node_id": node_id}
-
-    # Extraer mensajes y generar choices dinámicamente
-    if current_node.type == "ActionNode":
-        actions = current_node.data.get("actions", [])
-        capture_infos = [i for i, a in enumerate(actions) if a["type"] == "capture-info" and a.get("subtype") == "choice"]
-
-        # Agregar mensajes
-        for action in actions:
-            if action["type"] == "message":
-                response["messages"].append(action["value"])
-
-        # Generar choices
-        for capture_idx in capture_infos:
-            choice_action = actions[capture_idx]
-            choices_list = []
-            for option_idx, choice_value in enumerate(choice_action["value"]["choices"]):
-                target_id = None
-                for edge in edges:
-                    if edge["source"] == node_id and edge.get("sourceHandle"):
-                        if f"choice-{capture_idx}-{option_idx}" in edge["sourceHandle"]:
-                            target_id = edge["target"]
-                            break
-                # Si no se encontró edge con handle, usar primer edge sin sourceHandle
-                if not target_id:
-                    for edge in edges:
-                        if edge["source"] == node_id and not edge.get("sourceHandle"):
-                            target_id = edge["target"]
-                            break
-                choices_list.append({"id": target_id, "value": choice_value})
-            response["choices"].extend(choices_list)
-
-    # Determinar según la elección enviada
-    for choice in response["choices"]:
-        if choice["value"] == value:
-            return simulate_flow(choice["id"], value=value, flow=flow)
-
-
-    return response
\ No newline at end of file
+def simulate_flow(
+    node_id: str,
+    value: Optional[str],
+    flow: Union[FlowDB, CompiledFlow],
+    trace: Optional[List[str]] = None,
+):
+    compiled = flow if isinstance(flow, CompiledFlow) else get_compiled_flow(flow)
+    visited = set()
+
+    # Recorrido iterativo: se avanza mientras el valor coincida con una opción
+    while True:
+        current_node = compiled.nodes.get(node_id)
+
+        if not current_node:
+            raise HTTPException(status_code=404, detail="Nodo no encontrado")
+
+        # Si es EndNode, devolver mensaje de finalización
+        if current_node.type == "EndNode":
+            if trace is not None:
+                trace.append(node_id)
+            return {"messages": ["El flujo ha finalizado."], "choices": [], "node_id": node_id}
+
+        if current_node.type == "StartNode":
+            node_id = compiled.start_target
+            current_node = compiled.nodes.get(node_id)
+            if not current_node:
+                raise HTTPException(status_code=404, detail="Nodo no encontrado")
+
+        if trace is not None:
+            trace.append(node_id)
+
+        # Preparar respuesta
+        response = {"messages": [], "choices": [], "node_id": node_id}
+
+        if current_node.type == "ActionNode":
+            response["messages"] = list(current_node.messages)
+            response["choices"] = [dict(c) for c in compiled.choices.get(node_id, [])]
+
+        # Determinar según la elección enviada (un ciclo o una opción sin destino cortan el avance)
+        visited.add(node_id)
+        match = next((c for c in response["choices"] if c["value"] == value), None)
+        if match is None or match["id"] is None or match["id"] in visited:
+            return response
+        node_id = match["id"]
+
+
+# --------------------------------------------------------
+# SIMULACIÓN POR LOTES (GUIONES DE QA)
+# --------------------------------------------------------
+def run_script(flow: CompiledFlow, values: List[str], node_id: str = "start-node") -> dict:
+    visited: List[str] = []
+    steps = []
+    try:
+        response = simulate_flow(node_id, None, flow, trace=visited)
+        steps.append({"value": None, **response})
+        for value in values:
+            # El primer nodo del trazo es el actual, ya registrado en el paso anterior
+            trace: List[str] = []
+            response = simulate_flow(response["node_id"], value, flow, trace=trace)
+            visited.extend(trace[1:])
+            steps.append({"value": value, **response})
+    except HTTPException as exc:
+        return {"steps": steps, "visited": visited, "completed": False, "error": exc.detail}
+
+    completed = flow.nodes[response["node_id"]].type == "EndNode"
+    return {"steps": steps, "visited": visited, "completed": completed, "error": None}
+
+
+def _run_chunk(flow: CompiledFlow, scripts: List[dict]) -> List[dict]:
+    return [run_script(flow, s["values"], s.get("node_id", "start-node")) for s in scripts]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    # run_scripts corre en el threadpool: dos lotes simultáneos no deben crear dos pools
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.SIMULATION_BATCH_WORKERS)
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_scripts(flow: CompiledFlow, scripts: List[dict]) -> List[dict]:
+    workers = settings.SIMULATION_BATCH_WORKERS
+    if workers <= 1 or len(scripts) < settings.SIMULATION_BATCH_PARALLEL_MIN:
+        return _run_chunk(flow, scripts)
+
+    # Un chunk por worker: el flujo compilado se serializa una vez por chunk
+    size = -(-len(scripts) // workers)
+    chunks = [scripts[i:i + size] for i in range(0, len(scripts), size)]
+    results: List[dict] = []
+    for part in _get_pool().map(_run_chunk, [flow] * len(chunks), chunks):
+        results.extend(part)
+    return results
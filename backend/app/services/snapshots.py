@@ -0,0 +1,188 @@
+"""Snapshots de contenido (nodos + metadata) direccionados por hash.
+
+El documento del flujo sigue teniendo su copia de trabajo (lecturas de un solo viaje,
+PATCH atómico). Cada guardado que cambia el contenido hace un checkpoint: se guarda un
+snapshot inmutable (deduplicado por hash) solo si el contenido cambió desde el anterior. Cada fila de historial es una
+referencia al snapshot; el historial de un flujo se recorta a FLOW_HISTORY_MAX y el
+snapshot que se queda sin referencias se borra. Un duplicado solo referencia el snapshot
+(``detached``) y copia el contenido recién en su primera escritura.
+"""
+import asyncio
+import hashlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import orjson
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+
+from app.db import db
+from app.services.flow_doc import SCHEMA_REV_FIELD
+from app.settings import settings
+
+SNAPSHOTS = "flow_snapshots"
+HISTORY = "flow_history"
+# Flujo sin contenido propio: nodes/metadata se leen del snapshot referenciado
+DETACHED = "detached"
+# Versión del flujo en la que se tomó `snapshot`: si no coincide hay cambios sin checkpoint
+SNAPSHOT_VERSION = "snapshot_version"
+# Escrituras que necesitan el contenido en el documento (no en un snapshot)
+INLINE = {DETACHED: {"$ne": True}}
+
+
+def content_of(doc: dict) -> dict:
+    return {"nodes": doc.get("nodes") or [], "metadata": doc.get("metadata") or {}}
+
+
+def content_hash(content: dict) -> str:
+    # Claves ordenadas: el mismo contenido da el mismo hash sin importar el orden de escritura
+    return hashlib.sha256(orjson.dumps(content, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def prepare(content: dict) -> str:
+    return await run_in_threadpool(content_hash, content)
+
+
+async def acquire(digest: str, content: Optional[dict] = None, schema_rev: Optional[int] = None) -> bool:
+    """Suma una referencia al snapshot (antes de escribir la fila que lo usa).
+
+    Con el contenido lo crea si hace falta; sin él devuelve False si el snapshot ya no existe.
+    """
+    if content is None:
+        res = await db[SNAPSHOTS].update_one({"_id": digest}, {"$inc": {"refs": 1}})
+        return res.matched_count == 1
+    await db[SNAPSHOTS].update_one(
+        {"_id": digest},
+        {
+            "$setOnInsert": {**content, SCHEMA_REV_FIELD: schema_rev, "created_at": datetime.utcnow()},
+            "$inc": {"refs": 1},
+        },
+        upsert=True,
+    )
+    return True
+
+
+async def _release(digests: List[str]) -> None:
+    # Después de borrar las filas: si algo falla en el medio sobra un snapshot, nunca falta uno
+    counts = Counter(digests)
+    await asyncio.gather(*(
+        db[SNAPSHOTS].update_one({"_id": digest}, {"$inc": {"refs": -n}}) for digest, n in counts.items()
+    ))
+    await db[SNAPSHOTS].delete_many({"_id": {"$in": list(counts)}, "refs": {"$lte": 0}})
+
+
+async def _drop_rows(rows: List[dict]) -> None:
+    # Fila por fila: con dos recortes concurrentes cada referencia se libera una sola vez
+    results = await asyncio.gather(*(db[HISTORY].delete_one({"_id": row["_id"]}) for row in rows))
+    released = [row["snapshot"] for row, res in zip(rows, results) if res.deleted_count]
+    if released:
+        await _release(released)
+
+
+async def add_history(flow_id: str, version: int, digest: str, now: datetime) -> None:
+    """Fila de historial (con la referencia ya sumada) y recorte a FLOW_HISTORY_MAX."""
+    await db[HISTORY].insert_one({"flow_id": flow_id, "version": version, "snapshot": digest, "created_at": now})
+    cur = db[HISTORY].find({"flow_id": flow_id}, {"snapshot": 1}).sort("version", -1).skip(settings.FLOW_HISTORY_MAX)
+    old = [d async for d in cur]
+    if old:
+        await _drop_rows(old)
+
+
+async def forget(flow_id: str) -> None:
+    # Flujo borrado: su historial y los snapshots que solo él usaba
+    await _drop_rows([d async for d in db[HISTORY].find({"flow_id": flow_id}, {"snapshot": 1})])
+
+
+async def record(
+    flow_id: ObjectId,
+    version: int,
+    content: dict,
+    digest: str,
+    previous: Optional[str],
+    schema_rev: Optional[int] = None,
+) -> bool:
+    """Marca el checkpoint y, si el contenido cambió, guarda snapshot + historial."""
+    # Filtro por versión: un checkpoint que termina tarde no pisa un guardado más nuevo
+    stamp = db.flows.update_one(
+        {"_id": flow_id, "version": version}, {"$set": {"snapshot": digest, SNAPSHOT_VERSION: version}}
+    )
+    if digest == previous:
+        await stamp
+        return False
+    await acquire(digest, content, schema_rev)
+    await asyncio.gather(stamp, add_history(str(flow_id), version, digest, datetime.utcnow()))
+    return True
+
+
+async def checkpoint(flow_id: ObjectId) -> Optional[str]:
+    """Snapshot del contenido actual (solo se calcula si hubo cambios). None si el flujo no existe."""
+    head = await db.flows.find_one({"_id": flow_id}, {"version": 1, "snapshot": 1, SNAPSHOT_VERSION: 1})
+    if head is None:
+        return None
+    if head.get("snapshot") and head.get(SNAPSHOT_VERSION) == head.get("version", 0):
+        return head["snapshot"]
+    doc = await materialize(await db.flows.find_one(
+        {"_id": flow_id},
+        {"nodes": 1, "metadata": 1, "version": 1, "snapshot": 1, DETACHED: 1, SCHEMA_REV_FIELD: 1},
+    ))
+    if doc is None:
+        return None
+    return await checkpoint_doc(doc)
+
+
+async def checkpoint_doc(doc: dict) -> str:
+    """Checkpoint de un documento que ya trae el contenido (p. ej. el recién guardado)."""
+    content = content_of(doc)
+    digest = await prepare(content)
+    await record(doc["_id"], doc.get("version", 0), content, digest, doc.get("snapshot"), doc.get(SCHEMA_REV_FIELD))
+    return digest
+
+
+async def get_content(digest: str) -> Optional[dict]:
+    snap = await db[SNAPSHOTS].find_one({"_id": digest}, {"nodes": 1, "metadata": 1})
+    return content_of(snap) if snap else None
+
+
+async def materialize(doc: Optional[dict]) -> Optional[dict]:
+    if doc and doc.get(DETACHED):
+        content = await get_content(doc.get("snapshot"))
+        if content:
+            doc.update(content)
+    return doc
+
+
+async def materialize_many(docs: List[dict]) -> List[dict]:
+    digests = {d["snapshot"] for d in docs if d.get(DETACHED) and d.get("snapshot")}
+    if not digests:
+        return docs
+    found: Dict[str, dict] = {}
+    async for snap in db[SNAPSHOTS].find({"_id": {"$in": list(digests)}}):
+        found[snap["_id"]] = content_of(snap)
+    for d in docs:
+        if d.get(DETACHED) and d.get("snapshot") in found:
+            d.update(found[d["snapshot"]])
+    return docs
+
+
+async def attach(flow_id: ObjectId) -> bool:
+    """Copy-on-write: copia el contenido del snapshot al documento. False si no estaba desacoplado."""
+    doc = await db.flows.find_one({"_id": flow_id, DETACHED: True}, {"snapshot": 1})
+    if not doc:
+        return False
+    content = await get_content(doc.get("snapshot"))
+    if content is None:
+        content = content_of({})
+    await db.flows.update_one(
+        {"_id": flow_id, DETACHED: True, "snapshot": doc.get("snapshot")},
+        {"$set": content, "$unset": {DETACHED: ""}},
+    )
+    return True
+
+
+async def update_inline(flow_id: ObjectId, query: dict, update, **kwargs) -> Optional[dict]:
+    """find_one_and_update que exige el contenido en el documento (lo copia si hace falta)."""
+    res = await db.flows.find_one_and_update({**query, **INLINE}, update, **kwargs)
+    if res is None and await attach(flow_id):
+        res = await db.flows.find_one_and_update({**query, **INLINE}, update, **kwargs)
+    return res
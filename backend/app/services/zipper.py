@@ -1,27 +1,67 @@
 from zipfile import ZipFile, ZIP_DEFLATED, ZipInfo
-from io import BytesIO
-import time
+from typing import Iterable, Iterator, Tuple
 
-def make_zip(files: dict[str, bytes]) -> bytes:
-    buf = BytesIO()
-    with ZipFile(buf, "w", ZIP_DEFLATED) as zf:
+# Fecha fija para todas las entradas: el mismo contenido produce los mismos bytes
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink:
+    # Destino no posicionable: ZipFile escribe con data descriptors y sin seek
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return data
 
-        # Detectar carpetas necesarias
+
+def stream_zip(files: Iterable[Tuple[str, bytes]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Genera el zip por trozos a medida que llegan los archivos (memoria acotada por chunk_size)."""
+    sink = _ChunkSink()
+    with ZipFile(sink, "w", ZIP_DEFLATED) as zf:
         dirs = set()
-        for path in files.keys():
+
+        for path, data in files:
+            # Crear entradas de carpeta la primera vez que aparecen
             parts = path.split("/")
             for i in range(1, len(parts)):
-                dirs.add("/".join(parts[:i]) + "/")
+                d = "/".join(parts[:i]) + "/"
+                if d in dirs:
+                    continue
+                dirs.add(d)
+                info = ZipInfo(d, date_time=ZIP_EPOCH)
+                info.external_attr = 0o755 << 16  # permisos tipo carpeta
+                zf.writestr(info, "")
+
+            info = ZipInfo(path, date_time=ZIP_EPOCH)
+            info.external_attr = 0o644 << 16
+            info.compress_type = ZIP_DEFLATED
+            with zf.open(info, "w") as dst:
+                view = memoryview(data)
+                for start in range(0, len(view), chunk_size):
+                    dst.write(view[start:start + chunk_size])
+                    if sink.size >= chunk_size:
+                        yield sink.drain()
 
-        # Crear entradas de carpeta correctamente
-        for d in sorted(dirs):
-            info = ZipInfo(d)
-            info.external_attr = 0o755 << 16  # permisos tipo carpeta
-            info.date_time = time.localtime()[:6]
-            zf.writestr(info, "")
+            if sink.size >= chunk_size:
+                yield sink.drain()
 
-        # Escribir archivos
-        for path, data in files.items():
-            zf.writestr(path, data)
+    # Resto de datos + directorio central
+    if sink.size:
+        yield sink.drain()
 
-    return buf.getvalue()
+
+def make_zip(files: dict[str, bytes]) -> bytes:
+    return b"".join(stream_zip(files.items()))
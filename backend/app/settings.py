@@ -1,9 +1,89 @@
-
+from typing import Optional
+from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     MONGO_URI: str = "mongodb://localhost:27017"
-    MONGO_DB: str = "botverse"
+    MONGO_DB: str = Field(default="botverse", validation_alias=AliasChoices("MONGO_DB", "DB_NAME"))
+
+    # Pool y timeouts del cliente Mongo (ms)
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 2000
+    MONGO_CONNECT_TIMEOUT_MS: int = 2000
+    MONGO_SOCKET_TIMEOUT_MS: int = 10000
+
+    # Métricas Prometheus en /metrics (requests, threadpool, comandos Mongo)
+    METRICS_ENABLED: bool = True
+
+    # Perfilado por request (solo si se habilita): header o fracción de requests al azar
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_MS: float = 1.0
+    PROFILING_STORE_MAX: int = 50
+    PROFILING_STORE_TTL: int = 3600
+
+    # Índices al arrancar y umbral de comandos lentos en ms (0 desactiva el registro)
+    MONGO_ENSURE_INDEXES: bool = True
+    MONGO_SLOW_QUERY_MS: int = 100
+
+    # bcrypt: costo, hilos dedicados y cupo de espera (el exceso responde 429)
+    AUTH_BCRYPT_ROUNDS: int = 12
+    AUTH_HASH_WORKERS: int = 2
+    AUTH_HASH_QUEUE: int = 16
+
+    # Cache de tokens verificados y de usuarios para get_current_user (TTL en segundos)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL: int = 300
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL: int = 30
+
+    # Cache LRU de flujos compilados (clave: id + updated_at)
+    FLOW_CACHE_SIZE: int = 128
+
+    # Sesiones de simulación (TTL por inactividad, en segundos)
+    SIMULATION_SESSION_TTL: int = 900
+    SIMULATION_SESSION_MAX: int = 10000
+
+    # Invalidación de caches entre workers: change streams o, sin replica set, polling
+    INVALIDATION_ENABLED: bool = True
+    INVALIDATION_POLL_INTERVAL: float = 1.0
+    INVALIDATION_POLL_BATCH: int = 500
+    # Margen (segundos) por diferencias de reloj entre workers al comparar updated_at
+    INVALIDATION_POLL_OVERLAP: float = 2.0
+    INVALIDATION_RETRY_SECONDS: float = 5.0
+
+    # Simulación por WebSocket: conexiones por worker y cierre por inactividad (segundos)
+    SIMULATION_WS_MAX: int = 5000
+    SIMULATION_WS_IDLE_TIMEOUT: int = 900
+
+    # Simulación por lotes: procesos del pool y tamaño mínimo para repartir
+    SIMULATION_BATCH_WORKERS: int = 4
+    SIMULATION_BATCH_PARALLEL_MIN: int = 200
+    SIMULATION_BATCH_MAX_SCRIPTS: int = 5000
+
+    # Cache de exports Rasa por hash de contenido (memoria + disco opcional)
+    EXPORT_CACHE_SIZE: int = 64
+    EXPORT_CACHE_DIR: Optional[str] = None
+    EXPORT_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    EXPORT_CHUNK_SIZE: int = 64 * 1024
+
+    # Jobs de export en segundo plano (pool de procesos, TTL de artefactos en segundos)
+    EXPORT_WORKERS: int = 2
+    EXPORT_JOB_TTL: int = 600
+    EXPORT_JOB_MAX: int = 1000
+    # Export de proyecto completo: procesos propios; None = uno por CPU
+    PROJECT_EXPORT_WORKERS: Optional[int] = None
+
+    # Historial de versiones: checkpoints que se guardan por flujo (los más viejos se descartan)
+    FLOW_HISTORY_MAX: int = 50
+
+    # Compresión de respuestas (gzip / brotli) y cache por versión de flujo
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_CACHE_SIZE: int = 256
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,116 @@
+"""Latencia y throughput de los routers, en proceso (ASGI) y con mongomock como base.
+
+Uso (desde backend/):  python -m benchmarks.bench_api
+Requiere mongomock-motor y httpx (solo para benchmarks, no para la app).
+mongomock copia cada documento al leerlo: los tiempos de flujos grandes incluyen ese
+costo, así que sirven para comparar commits entre sí, no contra un Mongo real.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List
+
+# Antes de importar la app: bcrypt barato para el login del benchmark
+os.environ.setdefault("AUTH_BCRYPT_ROUNDS", "4")
+
+import httpx
+import mongomock_motor
+
+from app import db as mongo
+from benchmarks.common import percentile
+from benchmarks.synthetic import make_flow, walk_values_for
+
+SIZES = (100, 1_000, 10_000)
+
+
+def _use_mongomock() -> None:
+    client = mongomock_motor.AsyncMongoMockClient()
+    mongo.create_client = lambda: client
+    mongo._client = None
+
+
+async def measure(call: Callable[[], Awaitable[httpx.Response]], requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statuses = set()
+    queue = iter(range(requests))
+    # Calentamiento: caches (flujo compilado, compresión) se llenan fuera de la medición
+    await call()
+
+    async def worker():
+        for _ in queue:
+            start = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - start)
+            statuses.add(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "rps": requests / elapsed,
+        "statuses": sorted(statuses),
+    }
+
+
+async def _bench(sizes, requests: int, concurrency: int) -> dict:
+    from app.main import app
+
+    _use_mongomock()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register", json={"fullName": "bench", "email": "bench@example.com", "password": "bench"})
+        login = await client.post("/auth/login", json={"email": "bench@example.com", "password": "bench"})
+        login.raise_for_status()
+        project_id = (await client.post("/projects/", json={"name": "bench"})).json()["id"]
+
+        results = {}
+        for n in sizes:
+            flow = make_flow(n, project_id=project_id)
+            created = await client.post("/flows/", json=flow)
+            created.raise_for_status()
+            flow_id = created.json()["id"]
+            first = walk_values_for(flow)[:1]
+            # Pocos pedidos para los flujos grandes: se mide latencia, no paciencia
+            count = max(10, requests // max(1, n // 100))
+
+            cases = {
+                "get_flow": lambda: client.get(f"/flows/{flow_id}", headers={"Accept-Encoding": "identity"}),
+                "get_flow_gzip": lambda: client.get(f"/flows/{flow_id}", headers={"Accept-Encoding": "gzip"}),
+                "list_summary": lambda: client.get(f"/flows/by-project/{project_id}/summary"),
+                "simulate_step": lambda: client.post(
+                    f"/simulation/{flow_id}", json={"node_id": "node-0", "value": first[0] if first else ""}
+                ),
+                "analysis": lambda: client.get(f"/flows/{flow_id}/analysis"),
+                "export_zip": lambda: client.get(f"/bots/flows/{flow_id}/export"),
+            }
+            results[str(n)] = {
+                name: await measure(call, count, concurrency) for name, call in cases.items()
+            }
+    return results
+
+
+def run(sizes=SIZES, requests: int = 200, concurrency: int = 8) -> dict:
+    return asyncio.run(_bench(sizes, requests, concurrency))
+
+
+def print_results(results: dict) -> None:
+    for n, cases in results.items():
+        print(f"\n{n} nodos")
+        for name, r in cases.items():
+            print(
+                f"  {name:<16} p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  "
+                f"{r['rps']:>8.1f} req/s  ({r['requests']} req, estados {r['statuses']})"
+            )
+
+
+def main():
+    print_results(run())
+
+
+if __name__ == "__main__":
+    main()
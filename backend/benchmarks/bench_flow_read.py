@@ -0,0 +1,41 @@
+"""Lectura de un flujo: camino validado (response_model + json) vs flow_payload + orjson.
+
+Uso (desde backend/):  python -m benchmarks.bench_flow_read
+"""
+import json
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.schemas.flow import FlowDB
+from app.services.flow_doc import flow_payload
+from app.utils import format_mongo_document
+from benchmarks.common import best_of
+from benchmarks.synthetic import stored_flow
+
+SIZES = (1_000, 10_000)
+
+
+def validated_path(doc: dict) -> bytes:
+    # Lo que hacía FastAPI con response_model=FlowDB: copia, validación y json stdlib
+    flow = FlowDB.model_validate(format_mongo_document(doc))
+    return JSONResponse(flow.model_dump(mode="json")).body
+
+
+def fast_path(doc: dict) -> bytes:
+    return ORJSONResponse(flow_payload(doc)).body
+
+
+def main():
+    print(f"{'nodos':>8} {'MB':>6} {'validado (ms)':>14} {'orjson (ms)':>12} {'x':>6}")
+    for n in SIZES:
+        doc = stored_flow(n)
+        old_body, new_body = validated_path(doc), fast_path(doc)
+        assert json.loads(old_body) == json.loads(new_body), "la salida difiere"
+
+        old = best_of(lambda: validated_path(doc))
+        new = best_of(lambda: fast_path(doc))
+        print(f"{n:>8} {len(new_body) / 1e6:>6.1f} {old * 1000:>14.1f} {new * 1000:>12.1f} {old / new:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Caminos calientes en proceso: simulación, export Rasa, zip y lectura de documentos.
+
+Uso (desde backend/):  python -m benchmarks.bench_hotpaths
+"""
+from typing import List
+
+from app.schemas.flow import FlowDB
+from app.services.analysis import analyze_flow
+from app.services.flow_compile import check_flow
+from app.services.flow_graph import CompiledFlow, compile_flow, from_graph
+from app.services.rasa import generate_rasa_project, rasa_project_files
+from app.services.simulate import run_script, simulate_flow
+from app.services.zipper import make_zip
+from app.utils import format_mongo_document
+from benchmarks.common import timings
+from benchmarks.synthetic import stored_flow
+
+SIZES = (100, 1_000, 10_000)
+
+
+def walk_values(flow: CompiledFlow) -> List[str]:
+    # Guion que siempre elige la primera opción hasta llegar a un EndNode
+    values = []
+    node_id = flow.start_target
+    while node_id in flow.choices and flow.choices[node_id]:
+        choice = flow.choices[node_id][0]
+        values.append(choice["value"])
+        node_id = choice["id"]
+    return values
+
+
+def bench_size(n: int, repeat: int = 5) -> dict:
+    doc = stored_flow(n)
+    formatted = format_mongo_document(doc)
+    flow = FlowDB.model_validate(formatted)
+    compiled = compile_flow(flow)
+    _, graph = check_flow(formatted)
+    values = walk_values(compiled)
+    action_ids = [node.id for node in flow.nodes if node.type == "ActionNode"]
+    first_choice = {node_id: compiled.choices[node_id][0]["value"] for node_id in action_ids}
+    files = dict(rasa_project_files(graph))
+
+    def step_all():
+        for node_id in action_ids:
+            simulate_flow(node_id, first_choice[node_id], compiled)
+
+    results = {
+        "format_mongo_document": timings(lambda: format_mongo_document(doc), repeat),
+        "flowdb_validate": timings(lambda: FlowDB.model_validate(formatted), repeat),
+        "compile_flow": timings(lambda: compile_flow(flow), repeat),
+        # Lo que se hace al guardar (check_flow) y al leer la forma guardada (from_graph)
+        "check_flow": timings(lambda: check_flow(formatted), repeat),
+        "from_graph": timings(lambda: from_graph(graph), repeat),
+        # GET /flows/{id}/analysis sobre el documento (objetivo: < 100 ms a 10k nodos)
+        "analyze_flow": timings(lambda: analyze_flow(formatted), repeat),
+        "simulate_flow_all_nodes": timings(step_all, repeat),
+        "run_script_walk": timings(lambda: run_script(compiled, values), repeat),
+        "generate_rasa_project": timings(lambda: generate_rasa_project(graph), repeat),
+        "make_zip": timings(lambda: make_zip(files), repeat),
+    }
+    results["simulate_flow_all_nodes"]["per_step_us"] = (
+        results["simulate_flow_all_nodes"]["best_ms"] * 1000 / max(1, len(action_ids))
+    )
+    results["run_script_walk"]["steps"] = len(values)
+    return results
+
+
+def run(sizes=SIZES, repeat: int = 5) -> dict:
+    return {str(n): bench_size(n, repeat) for n in sizes}
+
+
+def print_results(results: dict) -> None:
+    for n, benches in results.items():
+        print(f"\n{n} nodos")
+        for name, r in benches.items():
+            print(f"  {name:<26} {r['best_ms']:>10.3f} ms  (mediana {r['median_ms']:.3f})")
+
+
+def main():
+    print_results(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Escalamiento de generate_rasa_project: el tiempo por nodo debe mantenerse constante.
+
+Uso (desde backend/):  python -m benchmarks.bench_rasa
+"""
+from app.services.flow_compile import compile_graph
+from app.services.rasa import generate_rasa_project, rasa_project_files
+from benchmarks.common import best_of
+from benchmarks.synthetic import make_flow
+
+SIZES = (1_000, 2_000, 5_000, 10_000)
+
+
+def main():
+    print(f"{'nodos':>8} {'compilar (ms)':>14} {'yaml+py (ms)':>14} {'zip (ms)':>10} {'µs/nodo':>9}")
+    for n in SIZES:
+        flow = make_flow(n)
+        # El export parte de la forma compilada al guardar; compilar se mide aparte
+        compiled = best_of(lambda: compile_graph(flow))
+        graph = compile_graph(flow)
+        files = best_of(lambda: dict(rasa_project_files(graph)))
+        full = best_of(lambda: generate_rasa_project(graph))
+        print(f"{n:>8} {compiled * 1000:>14.1f} {files * 1000:>14.1f} {full * 1000:>10.1f} {full / n * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Simulación por WebSocket: latencia por paso y costo de muchas sesiones abiertas a la vez.
+
+Uso (desde backend/):  python -m benchmarks.bench_ws
+Habla ASGI directo con la app (sin red ni servidor), con mongomock como base: mide el
+trabajo del servidor por mensaje, que es lo que limita cuántas sesiones aguanta un worker.
+"""
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("AUTH_BCRYPT_ROUNDS", "4")
+
+import httpx
+import orjson
+
+from benchmarks.bench_api import _use_mongomock
+from benchmarks.common import percentile
+from benchmarks.synthetic import make_flow
+
+SESSIONS = (100, 1_000, 3_000)
+
+
+class _Socket:
+    """Cliente ASGI mínimo: dos colas, sin handshake HTTP."""
+
+    def __init__(self, app, path: str):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        scope = {
+            "type": "websocket", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "headers": [], "scheme": "ws", "server": ("bench", 80), "client": ("bench", 1),
+            "subprotocols": [], "asgi": {"version": "3.0"},
+        }
+        self.task = asyncio.ensure_future(app(scope, self.inbox.get, self.outbox.put))
+
+    async def open(self) -> dict:
+        await self.inbox.put({"type": "websocket.connect"})
+        accept = await self.outbox.get()
+        assert accept["type"] == "websocket.accept", accept
+        return await self.frame()
+
+    async def frame(self) -> dict:
+        message = await self.outbox.get()
+        if message["type"] != "websocket.send":
+            raise RuntimeError(f"socket cerrado: {message}")
+        return orjson.loads(message["text"])
+
+    async def step(self, value: str) -> dict:
+        await self.inbox.put({"type": "websocket.receive", "text": orjson.dumps({"value": value}).decode()})
+        return await self.frame()
+
+    async def close(self) -> None:
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def _bench(sessions, steps: int) -> dict:
+    from app.main import app
+
+    _use_mongomock()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register", json={"fullName": "bench", "email": "bench@example.com", "password": "bench"})
+        (await client.post("/auth/login", json={"email": "bench@example.com", "password": "bench"})).raise_for_status()
+        project_id = (await client.post("/projects/", json={"name": "bench"})).json()["id"]
+        created = await client.post("/flows/", json=make_flow(1_000, project_id=project_id))
+        created.raise_for_status()
+        path = f"/simulation/{created.json()['id']}/ws"
+
+        # Calentamiento: el flujo compilado queda en memoria antes de medir
+        warm = _Socket(app, path)
+        await warm.open()
+        await warm.close()
+
+        results = {}
+        for n in sessions:
+            gc.collect()
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            sockets = [_Socket(app, path) for _ in range(n)]
+            frames = await asyncio.gather(*(s.open() for s in sockets))
+            held = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+
+            # Cada sesión responde siempre la primera opción del nodo en el que está
+            async def drive(socket: _Socket, frame: dict, count: int, latencies: List[float]):
+                for _ in range(count):
+                    value = frame["choices"][0]["value"] if frame.get("choices") else ""
+                    start = time.perf_counter()
+                    frame = await socket.step(value)
+                    latencies.append(time.perf_counter() - start)
+
+            # Latencia: un paso a la vez con las demás sesiones abiertas
+            latencies: List[float] = []
+            await drive(sockets[0], frames[0], steps * 10, latencies)
+
+            # Throughput: todas las sesiones respondiendo al mismo tiempo
+            total: List[float] = []
+            start = time.perf_counter()
+            await asyncio.gather(*(drive(s, f, steps, total) for s, f in zip(sockets, frames)))
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*(s.close() for s in sockets))
+
+            results[str(n)] = {
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "steps": len(total),
+                "steps_per_s": len(total) / elapsed,
+                "kb_per_session": held / n / 1024,
+            }
+    return results
+
+
+def run(sessions=SESSIONS, steps: int = 20) -> dict:
+    return asyncio.run(_bench(sessions, steps))
+
+
+def print_results(results: dict) -> None:
+    for n, r in results.items():
+        print(
+            f"{n:>6} sesiones  p50 {r['p50_ms']:>7.3f} ms  p95 {r['p95_ms']:>7.3f} ms  "
+            f"{r['steps_per_s']:>9.0f} pasos/s  {r['kb_per_session']:>6.1f} KB/sesión"
+        )
+
+
+def main():
+    print_results(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""GET /flows/{id}/analysis sin Mongo: formas de flujo que el editor guarda y límites del reporte.
+
+Uso (desde backend/):  python -m benchmarks.check_analysis
+
+Cada caso pasa el flujo por flow_payload + analyze_flow (lo mismo que hace el endpoint) y
+valida el resultado con FlowAnalysis. Sale con 1 si algo falla.
+"""
+import sys
+from datetime import datetime
+from typing import Callable, List
+
+from app.schemas.analysis import FlowAnalysis
+from app.services.analysis import PATH_COUNT_MAX, analyze_flow
+from app.services.flow_doc import flow_payload
+from benchmarks.synthetic import stored_flow
+
+P = {"x": 0.0, "y": 0.0}
+# Mayor entero que JavaScript representa sin pérdida
+JS_MAX_SAFE_INTEGER = 2 ** 53 - 1
+
+
+def _node(node_id: str, node_type: str = "ActionNode", actions: list = ()) -> dict:
+    return {"id": node_id, "type": node_type, "position": dict(P), "data": {"actions": list(actions)}}
+
+
+def _edge(edge_id: str, source: str, target: str, handle: str = None) -> dict:
+    return {"id": edge_id, "source": source, "target": target, "sourceHandle": handle}
+
+
+def _doc(nodes: list, edges: list) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": "000000000000000000000001", "project_id": "p", "name": "f", "nodes": nodes,
+        "metadata": {"edges": edges}, "created_at": now, "updated_at": now, "version": 1,
+    }
+
+
+def _analyze(doc: dict) -> dict:
+    report = analyze_flow(flow_payload(doc))
+    FlowAnalysis.model_validate(report)
+    return report
+
+
+def _choice_without_options() -> str:
+    # Acción choice recién agregada en el editor: value="" en vez de {"choices": [...]}
+    empty = {"type": "capture-info", "subtype": "choice", "value": ""}
+    ok = {"type": "capture-info", "subtype": "choice", "value": {"choices": ["Sí"]}}
+    report = _analyze(_doc(
+        [_node("start-node", "StartNode"), _node("a", actions=[empty, ok]), _node("end", "EndNode")],
+        [_edge("e1", "start-node", "a"), _edge("e2", "a", "end", "choice-1-0"), _edge("e3", "a", "end", "choice-0-0")],
+    ))
+    assert report["invalid_choices"] == [{"node_id": "a", "action": 0}], report["invalid_choices"]
+    assert [h["id"] for h in report["invalid_handles"]] == ["e3"], report["invalid_handles"]
+    assert report["path_count"] == 1 and not report["path_count_capped"], report
+    return "invalid_choices + invalid_handles"
+
+
+def _cycles() -> str:
+    report = _analyze(_doc(
+        [_node("start-node", "StartNode"), _node("a"), _node("b"), _node("x"), _node("y"), _node("end", "EndNode")],
+        [_edge("e1", "start-node", "a"), _edge("e2", "a", "end"), _edge("e3", "x", "y"), _edge("e4", "y", "x")],
+    ))
+    # Ciclo entre inalcanzables: se informa y el conteo de caminos sigue valiendo
+    assert report["cycles"] == [["x", "y"]] and report["path_count"] == 1, report
+    report = _analyze(_doc(
+        [_node("start-node", "StartNode"), _node("a"), _node("end", "EndNode")],
+        [_edge("e1", "start-node", "a"), _edge("e2", "a", "a"), _edge("e3", "a", "end")],
+    ))
+    assert report["cycles"] == [["a"]] and report["path_count"] is None, report
+    return "ciclo inalcanzable y ciclo alcanzable"
+
+
+def _path_count_capped() -> str:
+    report = _analyze(stored_flow(10_000))
+    assert report["path_count"] == PATH_COUNT_MAX <= JS_MAX_SAFE_INTEGER and report["path_count_capped"], report["path_count"]
+    return f"10k nodos: path_count={report['path_count']} (tope)"
+
+
+CASES: List[Callable[[], str]] = [_choice_without_options, _cycles, _path_count_capped]
+
+
+def main():
+    failures = 0
+    for case in CASES:
+        try:
+            print(f"ok   {case()}")
+        except Exception as exc:
+            failures += 1
+            print(f"FAIL {case.__name__}  {exc!r}")
+    print(f"{failures} fallas" if failures else "todo ok")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""PATCH /flows/{id} contra un Mongo real: altas, cambios y bajas de nodos y edges, y los 409.
+
+Uso (desde backend/, con un mongod en MONGO_URI):  python -m benchmarks.check_patch
+
+Necesita un mongod (standalone alcanza): mongomock no implementa $indexOfArray ni
+$mergeObjects, que usa el update por pipeline de flow_patch para los cambios, y evalúa
+{"$not": [expr]} como la lista y no como expr, así que las bajas tampoco sirven ahí. Se usa una
+base temporal (<MONGO_DB>_check_patch) que se borra al terminar; sale con 1 si algo falla.
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import List
+
+import httpx
+
+from app import db as mongo
+from app.settings import settings
+
+P = {"x": 0.0, "y": 0.0}
+
+
+def _node(node_id: str, node_type: str = "ActionNode", text: str = "hola") -> dict:
+    data = {"actions": [{"type": "message", "subtype": "text", "value": text}]} if node_type == "ActionNode" else {}
+    return {"id": node_id, "type": node_type, "position": dict(P), "data": data}
+
+
+def _edge(edge_id: str, source: str, target: str) -> dict:
+    return {"id": edge_id, "source": source, "target": target}
+
+
+class Checker:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.failures: List[str] = []
+
+    def check(self, name: str, ok: bool, detail: str = "") -> None:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{'' if ok else '  ' + detail}")
+        if not ok:
+            self.failures.append(name)
+
+    async def flow(self, flow_id: str) -> dict:
+        response = await self.client.get(f"/flows/{flow_id}", headers={"Accept-Encoding": "identity"})
+        response.raise_for_status()
+        return response.json()
+
+    async def patch(self, flow_id: str, version: int, ops: list, **extra) -> httpx.Response:
+        return await self.client.patch(f"/flows/{flow_id}", json={"version": version, "ops": ops, **extra})
+
+
+def _ids(items: list) -> list:
+    return [i["id"] for i in items]
+
+
+async def _run(c: Checker, project_id: str) -> None:
+    nodes = [_node("start-node", "StartNode"), _node("a"), _node("b")]
+    edges = [_edge("e1", "start-node", "a"), _edge("e2", "a", "b")]
+    created = await c.client.post(
+        "/flows/", json={"project_id": project_id, "name": "patch", "nodes": nodes, "metadata": {"edges": edges}}
+    )
+    created.raise_for_status()
+    flow_id = created.json()["id"]
+
+    r = await c.patch(flow_id, 1, [
+        {"op": "add", "target": "node", "value": _node("c")},
+        {"op": "add", "target": "edge", "value": _edge("e3", "b", "c")},
+    ])
+    doc = await c.flow(flow_id)
+    c.check("alta de nodo y edge", r.status_code == 200 and r.json()["version"] == 2
+            and _ids(doc["nodes"]) == ["start-node", "a", "b", "c"]
+            and _ids(doc["metadata"]["edges"]) == ["e1", "e2", "e3"], f"{r.status_code} {r.text}")
+
+    r = await c.patch(flow_id, 2, [
+        {"op": "update", "target": "node", "id": "a", "value": {"position": {"x": 5, "y": 7}}},
+        {"op": "update", "target": "node", "id": "b", "value": {"data": {"actions": []}}},
+        {"op": "update", "target": "edge", "id": "e2", "value": {"target": "c", "label": "x"}},
+    ])
+    doc = await c.flow(flow_id)
+    a, b = doc["nodes"][1], doc["nodes"][2]
+    e2 = doc["metadata"]["edges"][1]
+    c.check("cambio parcial de nodo (conserva el resto)", a["position"] == {"x": 5.0, "y": 7.0}
+            and a["type"] == "ActionNode" and a["data"] == nodes[1]["data"], str(a))
+    c.check("cambio de data de nodo", b["data"] == {"actions": []} and b["position"] == P, str(b))
+    c.check("cambio de edge", e2 == {"id": "e2", "source": "a", "target": "c", "label": "x"}
+            and r.json()["version"] == 3, str(e2))
+
+    r = await c.patch(flow_id, 3, [
+        {"op": "remove", "target": "node", "id": "b"},
+        {"op": "remove", "target": "edge", "id": "e3"},
+    ])
+    doc = await c.flow(flow_id)
+    c.check("baja de nodo y edge", _ids(doc["nodes"]) == ["start-node", "a", "c"]
+            and _ids(doc["metadata"]["edges"]) == ["e1", "e2"] and r.json()["version"] == 4, str(doc["metadata"]))
+
+    r = await c.patch(flow_id, 4, [
+        {"op": "add", "target": "node", "value": _node("d")},
+        {"op": "update", "target": "node", "id": "d", "value": {"position": {"x": 1, "y": 2}}},
+        {"op": "add", "target": "node", "value": _node("tmp")},
+        {"op": "remove", "target": "node", "id": "tmp"},
+        {"op": "remove", "target": "node", "id": "c"},
+        {"op": "update", "target": "node", "id": "no-existe", "value": {"position": {"x": 9, "y": 9}}},
+    ], name="renombrado")
+    doc = await c.flow(flow_id)
+    c.check("ops combinadas en un pedido", _ids(doc["nodes"]) == ["start-node", "a", "d"]
+            and doc["nodes"][2]["position"] == {"x": 1.0, "y": 2.0} and doc["name"] == "renombrado"
+            and r.json()["version"] == 5, str(_ids(doc["nodes"])))
+
+    before = await c.flow(flow_id)
+    r = await c.patch(flow_id, 2, [{"op": "remove", "target": "node", "id": "a"}])
+    after = await c.flow(flow_id)
+    detail = r.json().get("detail") if r.status_code == 409 else r.text
+    c.check("versión vieja -> 409 sin tocar el documento", r.status_code == 409
+            and detail.get("version") == 5 and before == after, f"{r.status_code} {detail}")
+
+    before = await c.flow(flow_id)
+    r = await c.patch(flow_id, 5, [
+        {"op": "add", "target": "node", "value": _node("a")},
+        {"op": "add", "target": "edge", "value": _edge("e1", "a", "d")},
+        {"op": "add", "target": "edge", "value": _edge("e9", "a", "d")},
+    ])
+    after = await c.flow(flow_id)
+    detail = r.json().get("detail") if r.status_code == 409 else r.text
+    c.check("alta con id existente -> 409 sin tocar el documento", r.status_code == 409
+            and detail.get("duplicates") == {"node": ["a"], "edge": ["e1"]} and before == after,
+            f"{r.status_code} {detail}")
+
+    r = await c.patch(flow_id, 5, [
+        {"op": "remove", "target": "node", "id": "d"},
+        {"op": "add", "target": "node", "value": _node("d", text="reemplazo")},
+    ])
+    doc = await c.flow(flow_id)
+    c.check("quitar y volver a agregar un id lo reemplaza", r.status_code == 200 and r.json()["version"] == 6
+            and _ids(doc["nodes"]) == ["start-node", "a", "d"]
+            and doc["nodes"][2]["data"]["actions"][0]["value"] == "reemplazo", f"{r.status_code} {r.text}")
+
+    r = await c.patch(flow_id, 6, [
+        {"op": "add", "target": "node", "value": _node("x")},
+        {"op": "add", "target": "node", "value": _node("x")},
+    ])
+    c.check("el mismo id agregado dos veces en un pedido -> 422", r.status_code == 422, f"{r.status_code} {r.text}")
+
+    r = await c.patch(flow_id, 6, [{"op": "remove", "target": "node"}])
+    c.check("op sin id -> 422", r.status_code == 422, f"{r.status_code} {r.text}")
+
+    r = await c.patch("0" * 24, 0, [])
+    c.check("flujo inexistente -> 404", r.status_code == 404, f"{r.status_code} {r.text}")
+
+    # Documento anterior al versionado y sin metadata.edges: versión 0 y $ifNull sobre campos faltantes
+    legacy = await mongo.get_db().flows.insert_one({
+        "project_id": project_id, "name": "legacy", "nodes": [nodes[0]], "metadata": {},
+        "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+    })
+    legacy_id = str(legacy.inserted_id)
+    r = await c.patch(legacy_id, 0, [
+        {"op": "add", "target": "node", "value": _node("a")},
+        {"op": "add", "target": "edge", "value": _edge("e1", "start-node", "a")},
+    ])
+    doc = await c.flow(legacy_id)
+    c.check("documento sin version ni edges", r.status_code == 200 and r.json()["version"] == 1
+            and _ids(doc["nodes"]) == ["start-node", "a"] and _ids(doc["metadata"]["edges"]) == ["e1"],
+            f"{r.status_code} {r.text}")
+
+
+async def main_async() -> int:
+    from app.main import app
+
+    settings.MONGO_DB = f"{settings.MONGO_DB}_check_patch"
+    mongo._client = None
+    database = mongo.get_db()
+    info = await database.command("buildInfo")
+    print(f"Mongo {info.get('version')} en {settings.MONGO_URI} / {settings.MONGO_DB}")
+
+    try:
+        project = await database.projects.insert_one({"name": "check_patch"})
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+            checker = Checker(client)
+            await _run(checker, str(project.inserted_id))
+    finally:
+        await database.client.drop_database(settings.MONGO_DB)
+        await mongo.close()
+    print(f"{len(checker.failures)} fallas" if checker.failures else "todo ok")
+    return 1 if checker.failures else 0
+
+
+def main():
+    sys.exit(asyncio.run(main_async()))
+
+
+if __name__ == "__main__":
+    main()
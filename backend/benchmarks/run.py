@@ -0,0 +1,93 @@
+"""Suite completa: guarda los resultados en JSON para comparar entre commits.
+
+Uso (desde backend/):
+    python -m benchmarks.run                       # todo, tamaños 100/1k/10k
+    python -m benchmarks.run --quick               # solo 100/1k, menos pedidos
+    python -m benchmarks.run --compare benchmarks/results/<otro>.json
+"""
+import argparse
+import json
+import os
+
+from benchmarks import bench_api, bench_hotpaths, bench_ws
+from benchmarks.common import environment
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Métrica que se compara en cada tipo de resultado (menor es mejor)
+METRICS = ("best_ms", "p50_ms")
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict) and not any(m in value for m in METRICS):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, dict):
+            metric = next(m for m in METRICS if m in value)
+            flat[name] = value[metric]
+    return flat
+
+
+def compare(current: dict, baseline: dict, threshold: float = 1.10, min_delta_ms: float = 0.05) -> int:
+    now, before = _flatten(current["results"]), _flatten(baseline["results"])
+    print(f"\nComparación contra {baseline['env'].get('commit')} ({baseline['env'].get('timestamp')})")
+    regressions = 0
+    for name in sorted(now):
+        if name not in before or before[name] <= 0:
+            continue
+        ratio = now[name] / before[name]
+        flag = ""
+        if abs(now[name] - before[name]) < min_delta_ms:
+            pass  # diferencias de microsegundos son ruido
+        elif ratio >= threshold:
+            flag = "  <-- más lento"
+            regressions += 1
+        elif ratio <= 1 / threshold:
+            flag = "  más rápido"
+        print(f"  {name:<55} {before[name]:>10.3f} -> {now[name]:>10.3f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="tamaños 100/1k y menos pedidos")
+    parser.add_argument("--skip-api", action="store_true", help="sin la corrida end-to-end")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    sizes = (100, 1_000) if args.quick else (100, 1_000, 10_000)
+    report = {"env": environment(), "sizes": list(sizes), "results": {}}
+
+    results = bench_hotpaths.run(sizes)
+    bench_hotpaths.print_results(results)
+    report["results"]["hotpaths"] = results
+
+    if not args.skip_api:
+        results = bench_api.run(sizes, requests=50 if args.quick else 200)
+        bench_api.print_results(results)
+        report["results"]["api"] = results
+
+        results = bench_ws.run((100, 1_000) if args.quick else bench_ws.SESSIONS)
+        bench_ws.print_results(results)
+        report["results"]["websocket"] = results
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = report["env"]["commit"] or "local"
+        if report["env"]["dirty"]:
+            name += "-dirty"
+        output = os.path.join(RESULTS_DIR, f"{name}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados en {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
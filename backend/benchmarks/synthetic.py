@@ -0,0 +1,96 @@
+import random
+from datetime import datetime
+from typing import Optional
+
+
+def make_flow(
+    n_nodes: int,
+    fan_out: int = 3,
+    seed: int = 0,
+    project_id: str = "000000000000000000000000",
+    flow_id: Optional[str] = None,
+) -> dict:
+    """Flujo sintético: N ActionNodes con `fan_out` opciones y edges choice-i-j coherentes."""
+    rng = random.Random(seed)
+    nodes = [
+        {"id": "start-node", "type": "StartNode", "position": {"x": 0, "y": 0}, "data": {}},
+        {"id": "end-node", "type": "EndNode", "position": {"x": 0, "y": 0}, "data": {}},
+    ]
+    edges = [{"id": "e-start", "source": "start-node", "target": "node-0"}]
+
+    for i in range(n_nodes):
+        node_id = f"node-{i}"
+        choices = [f"Opción {i}-{j}" for j in range(fan_out)]
+        nodes.append({
+            "id": node_id,
+            "type": "ActionNode",
+            "position": {"x": float(i % 100) * 250, "y": float(i // 100) * 180},
+            "data": {"actions": [
+                {"type": "message", "subtype": "text", "value": f"Paso {i}: elige una opción"},
+                {"type": "capture-info", "subtype": "choice", "value": {"choices": choices}},
+            ]},
+        })
+        for j in range(fan_out):
+            # Siempre hacia adelante (flujo acíclico); el último nodo cierra en end-node
+            if i + 1 < n_nodes:
+                target = f"node-{rng.randrange(i + 1, min(n_nodes, i + 1 + 4 * fan_out))}"
+            else:
+                target = "end-node"
+            edges.append({
+                "id": f"e-{i}-{j}",
+                "source": node_id,
+                "sourceHandle": f"choice-1-{j}",
+                "target": target,
+            })
+
+    flow = {
+        "project_id": project_id,
+        "name": f"synthetic-{n_nodes}",
+        "nodes": nodes,
+        "metadata": {"edges": edges},
+    }
+    if flow_id:
+        flow["id"] = flow_id
+    return flow
+
+
+def stored_flow(n_nodes: int, fan_out: int = 3, seed: int = 0, project_id: str = "000000000000000000000000") -> dict:
+    """Documento como lo deja create_flow en Mongo (nodos normalizados, fechas, versión)."""
+    from bson import ObjectId
+
+    from app.schemas.flow import FlowCreate
+    from app.services.flow_doc import SCHEMA_REV, SCHEMA_REV_FIELD
+
+    now = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    doc = FlowCreate(**make_flow(n_nodes, fan_out, seed, project_id)).model_dump()
+    doc.update({
+        "_id": ObjectId(),
+        "created_at": now,
+        "updated_at": now,
+        "version": 1,
+        SCHEMA_REV_FIELD: SCHEMA_REV,
+    })
+    return doc
+
+
+def walk_values_for(flow: dict) -> list:
+    """Valores que recorren el flujo eligiendo siempre la primera opción (desde node-0)."""
+    first = {}
+    choices = {}
+    for node in flow["nodes"]:
+        for idx, action in enumerate(node.get("data", {}).get("actions", [])):
+            if action.get("type") == "capture-info" and action.get("subtype") == "choice":
+                choices[node["id"]] = (idx, action["value"]["choices"])
+                break
+    for edge in flow["metadata"]["edges"]:
+        handle = edge.get("sourceHandle") or ""
+        node = choices.get(edge["source"])
+        if node and handle == f"choice-{node[0]}-0":
+            first.setdefault(edge["source"], edge["target"])
+
+    values = []
+    node_id = "node-0"
+    while node_id in choices and node_id in first:
+        values.append(choices[node_id][1][0])
+        node_id = first[node_id]
+    return values